@@ -0,0 +1,137 @@
+"""
+Per-step benchmark of the Urban Routes booking journey.
+
+The full journey is run several times on pooled browsers. Every
+UrbanRoutesPage method call is timed and split into wait and command
+time; p50/p95 per method are written to a JSON file and compared to a
+stored baseline. The run fails when a step regresses beyond the
+threshold:
+
+    python -m benchmarks.journey_bench --runs 5 --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from pages.scenarios import Journey, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.instrumentation import StepTimings, instrument
+from utilities.session_pool import get_pool
+from utilities.stats import summarize
+
+default_output = '.urban_routes/bench.json'
+
+
+def run_journeys(runs, virtual_time=False, setup=None):
+    """
+    Run the whole booking journey several times and time every step.
+
+    Args:
+        runs: Number of journeys
+        virtual_time: Fast-forward the car search countdown
+        setup: Optional callable receiving each driver before its journey
+
+    Returns:
+        StepTimings with one sample per page-object method call, and the
+        list of journey wall times
+    """
+    timings = StepTimings()
+    journeys = []
+    pool = get_pool()
+    for _ in range(runs):
+        driver = pool.checkout()
+        try:
+            if setup is not None:
+                setup(driver)
+            page = instrument(UrbanRoutesPage(driver, virtual_time=virtual_time), timings)
+            start = time.perf_counter()
+            Journey(page).run(*steps)
+            journeys.append(time.perf_counter() - start)
+        finally:
+            pool.checkin(driver)
+    return timings, journeys
+
+
+def build_results(timings, journeys):
+    """Summarize step timings into the machine-readable results format."""
+    results = {'runs': len(journeys), 'journey': summarize(journeys), 'steps': {}}
+    for step in sorted(timings.samples):
+        results['steps'][step] = {
+            'total': summarize(timings.totals(step)),
+            'wait': summarize(timings.waits(step)),
+            'command': summarize(timings.commands(step)),
+        }
+    return results
+
+
+def compare(results, baseline, threshold=0.2, min_delta=0.05):
+    """
+    Compare step p50/p95 against a baseline.
+
+    Args:
+        results: Results of the current run
+        baseline: Results of the baseline run
+        threshold: Allowed relative slowdown, e.g. 0.2 for 20 %
+        min_delta: Absolute slowdown in seconds below which changes are noise
+
+    Returns:
+        List of human-readable regression descriptions
+    """
+    regressions = []
+    for step, expected in baseline.get('steps', {}).items():
+        measured = results['steps'].get(step)
+        if measured is None:
+            continue
+        for key in ('p50', 'p95'):
+            before, after = expected['total'][key], measured['total'][key]
+            if after > before * (1 + threshold) and after - before > min_delta:
+                regressions.append(f'{step} {key}: {before:.3f}s -> {after:.3f}s '
+                                   f'(+{(after / before - 1) * 100 if before else float("inf"):.0f}%)')
+    return regressions
+
+
+def format_table(results):
+    """Return the results as a fixed-width text table."""
+    lines = [f"{'step':<45}{'calls':>6}{'p50':>9}{'p95':>9}{'wait p50':>10}{'cmd p50':>9}"]
+    for step, measured in results['steps'].items():
+        lines.append(f"{step:<45}{measured['total']['count']:>6}{measured['total']['p50']:>9.3f}"
+                     f"{measured['total']['p95']:>9.3f}{measured['wait']['p50']:>10.3f}"
+                     f"{measured['command']['p50']:>9.3f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Run the benchmark, write the results and check them against the baseline."""
+    parser = argparse.ArgumentParser(description='Benchmark every step of the booking journey.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', default=default_output)
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative p50/p95 slowdown per step (default: 0.2)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Write the results to the baseline file instead of comparing')
+    parser.add_argument('--virtual-time', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        timings, journeys = run_journeys(args.runs, args.virtual_time)
+    finally:
+        get_pool().close()
+    results = build_results(timings, journeys)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(format_table(results))
+
+    if args.baseline and args.update_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2))
+    elif args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
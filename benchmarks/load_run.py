@@ -0,0 +1,206 @@
+"""
+Concurrent end-to-end load run against the Urban Routes app.
+
+Many booking journeys are driven at the same time from a thread pool,
+each on its own pooled browser and each with a different synthetic
+booking from data.generator. The run reports completed bookings per
+minute and latency percentiles per journey step:
+
+    python -m benchmarks.load_run --workers 4 --bookings 40 --virtual-time
+
+With --contexts a single browser hosts every journey, each in its own
+browser context driven by an AsyncUrbanRoutesPage, and --workers sets
+the number of contexts open at the same time:
+
+    python -m benchmarks.load_run --contexts --workers 16 --bookings 80
+"""
+import asyncio
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from data import data
+from data.generator import bookings
+from pages.scenarios import Journey, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.browser_contexts import BrowserContextPool, run_journeys
+from utilities.browser_profiles import profiles, resident_memory
+from utilities.session_pool import configure_pool
+from utilities.stats import summarize
+
+
+class LoadRun:
+    """Drives booking journeys concurrently and collects their step latencies."""
+
+    def __init__(self, workers, count=None, duration=None, seed=None, virtual_time=False, profile=None,
+                 contexts=False):
+        """
+        Initialize the load run.
+
+        Args:
+            workers: Number of concurrent journeys (and browsers)
+            count: Stop after this many journeys have been started
+            duration: Stop starting journeys after this many seconds
+            seed: Seed of the booking generator
+            virtual_time: Fast-forward the car search countdown
+            profile: Name of the browser profile, defaults to data.browser_profile
+            contexts: Run the journeys in browser contexts of a single browser,
+                workers being the number of concurrent contexts
+        """
+        self.workers = workers
+        self.duration = duration
+        self.virtual_time = virtual_time
+        self.contexts = contexts
+        self.latencies = {}
+        self.context_startup = []
+        self.memory = []
+        self.completed = 0
+        self.failures = []
+        self._bookings = bookings(seed=seed, count=count)
+        self._lock = threading.Lock()
+        self._deadline = None
+        self.profile = profiles[profile or data.browser_profile]
+        self._pool = configure_pool(size=workers, factory=self.profile)
+
+    def _next_booking(self):
+        """Return the next booking, or None once the run should stop."""
+        with self._lock:
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                return None
+            return next(self._bookings, None)
+
+    def _record(self, step, elapsed):
+        with self._lock:
+            self.latencies.setdefault(step, []).append(elapsed)
+
+    def _worker(self):
+        """Run journeys on one browser until the bookings run out."""
+        while (booking := self._next_booking()) is not None:
+            driver = self._pool.checkout()
+            try:
+                journey = Journey(UrbanRoutesPage(driver, virtual_time=self.virtual_time), booking=booking)
+                for name in steps:
+                    start = time.perf_counter()
+                    journey.run(name)
+                    self._record(name, time.perf_counter() - start)
+                with self._lock:
+                    self.completed += 1
+            except Exception as error:
+                with self._lock:
+                    self.failures.append(f'{type(error).__name__}: {error}'.splitlines()[0])
+            finally:
+                self._pool.checkin(driver)
+
+    def _finished(self, booking, elapsed, error, driver):
+        """Record a journey run in a browser context."""
+        self._record('journey', elapsed)
+        memory = resident_memory(driver)
+        with self._lock:
+            if memory is not None:
+                self.memory.append(memory / 2 ** 20)
+            if error is None:
+                self.completed += 1
+            else:
+                self.failures.append(f'{type(error).__name__}: {error}'.splitlines()[0])
+
+    async def _drive_contexts(self, driver):
+        """Schedule every booking onto a browser context of the driver's browser."""
+        pool = await BrowserContextPool.attach(driver)
+        try:
+            await run_journeys(pool, iter(self._next_booking, None), self.workers,
+                               lambda *result: self._finished(*result, driver))
+        finally:
+            self.context_startup = pool.startup_times
+            await pool.close()
+
+    def _run_browsers(self):
+        """Run the journeys from a thread pool, one pooled browser per worker."""
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for future in [executor.submit(self._worker) for _ in range(self.workers)]:
+                    future.result()
+        finally:
+            self._pool.close()
+
+    def _run_contexts(self):
+        """Run the journeys in browser contexts of a single browser."""
+        driver = self.profile.launch()
+        try:
+            asyncio.run(self._drive_contexts(driver))
+        finally:
+            driver.quit()
+
+    def run(self):
+        """
+        Run the load and return its results.
+
+        Returns:
+            Dictionary with completed and failed bookings, bookings per
+            minute and per-step latency summaries
+        """
+        if not self.contexts:
+            self._pool.start()
+        start = time.monotonic()
+        if self.duration is not None:
+            self._deadline = start + self.duration
+        if self.contexts:
+            self._run_contexts()
+        else:
+            self._run_browsers()
+        elapsed = time.monotonic() - start
+        results = {
+            'workers': self.workers,
+            'elapsed': elapsed,
+            'completed': self.completed,
+            'failed': len(self.failures),
+            'bookings_per_minute': self.completed / elapsed * 60 if elapsed else 0.0,
+            'profile': self.profile.stats(),
+            'steps': {name: summarize(self.latencies[name]) for name in (*steps, 'journey')
+                      if name in self.latencies},
+            'failures': self.failures,
+        }
+        if self.contexts:
+            results['contexts'] = {'startup': summarize(self.context_startup),
+                                   'browser_memory_mb': summarize(self.memory)}
+        return results
+
+
+def main(argv=None):
+    """Run the load and print the throughput and per-step latencies."""
+    parser = argparse.ArgumentParser(description='Drive concurrent booking journeys.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--bookings', type=int, default=None, help='Number of journeys to run')
+    parser.add_argument('--duration', type=float, default=None, help='Seconds to keep starting journeys')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--virtual-time', action='store_true')
+    parser.add_argument('--browser-profile', choices=sorted(profiles), default=data.browser_profile)
+    parser.add_argument('--contexts', action='store_true',
+                        help='Run every journey in its own browser context of a single browser')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+    if args.bookings is None and args.duration is None:
+        parser.error('give --bookings and/or --duration')
+    if args.contexts and args.virtual_time:
+        parser.error('--virtual-time is not supported with --contexts')
+
+    results = LoadRun(args.workers, args.bookings, args.duration, args.seed, args.virtual_time,
+                      args.browser_profile, args.contexts).run()
+    print(f"{results['completed']} bookings completed, {results['failed']} failed in "
+          f"{results['elapsed']:.1f}s: {results['bookings_per_minute']:.1f} bookings/minute")
+    print(f"{'step':<28}{'p50':>9}{'p95':>9}{'max':>9}")
+    for name, summary in results['steps'].items():
+        print(f"{name:<28}{summary['p50']:>9.3f}{summary['p95']:>9.3f}{summary['max']:>9.3f}")
+    if 'contexts' in results:
+        contexts = results['contexts']
+        print(f"context startup: {contexts['startup']['p50'] * 1000:.0f} ms p50, "
+              f"browser memory: {contexts['browser_memory_mb']['max']:.0f} MB max")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 1 if results['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Locator strategy benchmark against saved DOM snapshots.
+
+Snapshots of the application DOM are taken after every journey step.
+Each UrbanRoutesPage locator is then evaluated repeatedly inside the
+browser against every snapshot, once per strategy: the document-wide
+XPath or selector, the scoped lookup with a fresh container search,
+and the scoped lookup with the cached container. The mean evaluation
+cost per strategy is reported, together with whether it found the
+same element as the document-wide lookup:
+
+    python -m benchmarks.locator_bench --capture
+    python -m benchmarks.locator_bench --iterations 500
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from pages.locators import ScopedLocator, script_locator
+from pages.resolver import FIND_ELEMENT
+from pages.scenarios import Journey, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.session_pool import get_pool
+
+default_snapshot_dir = '.urban_routes/snapshots'
+
+_SNAPSHOT = "return document.documentElement.outerHTML;"
+
+_LOAD_SNAPSHOT = """
+document.open();
+document.write(arguments[0]);
+document.close();
+"""
+
+_MEASURE = FIND_ELEMENT + """
+var locator = arguments[0], strategy = arguments[1], iterations = arguments[2];
+function lookup() {
+    if (strategy === 'document') { return findElement(locator[0], locator[1]); }
+    if (strategy === 'scoped') { window.__urbanRoutesContainers = containerCache = {}; }
+    return findLocator(locator);
+}
+var reference = findElement(locator[0], locator[1]);
+var element = lookup();
+var start = performance.now();
+for (var i = 0; i < iterations; i++) { lookup(); }
+return {micros: (performance.now() - start) * 1000 / iterations,
+        found: !!element, matches: element === reference};
+"""
+
+
+def save_dom_snapshot(driver, path):
+    """
+    Save the current application DOM without its scripts.
+
+    Args:
+        driver: Selenium WebDriver instance
+        path: File to write the HTML to
+    """
+    html = driver.execute_script(_SNAPSHOT)
+    html = re.sub(r'<script\b[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text('<!DOCTYPE html>' + html)
+
+
+def capture_snapshots(directory):
+    """Run the journey once and save a DOM snapshot after every step."""
+    driver = get_pool().checkout()
+    try:
+        journey = Journey(UrbanRoutesPage(driver, virtual_time=True))
+        for index, name in enumerate(steps):
+            journey.run(name)
+            save_dom_snapshot(driver, Path(directory) / f'{index:02d}_{name}.html')
+    finally:
+        get_pool().checkin(driver)
+
+
+def page_locators():
+    """Return the locator class attributes of UrbanRoutesPage by name."""
+    return {name: value for name, value in vars(UrbanRoutesPage).items()
+            if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], str)}
+
+
+def benchmark(directory, iterations):
+    """
+    Evaluate every locator strategy against every snapshot.
+
+    Returns:
+        Dictionary mapping locator name to strategy results per snapshot
+    """
+    driver = get_pool().checkout()
+    results = {}
+    try:
+        for snapshot in sorted(Path(directory).glob('*.html')):
+            driver.get('about:blank')
+            driver.execute_script(_LOAD_SNAPSHOT, snapshot.read_text())
+            for name, locator in page_locators().items():
+                strategies = ('document', 'scoped', 'scoped_cached') \
+                    if isinstance(locator, ScopedLocator) else ('document',)
+                for strategy in strategies:
+                    measured = driver.execute_script(_MEASURE, script_locator(locator), strategy, iterations)
+                    results.setdefault(name, {}).setdefault(strategy, {})[snapshot.stem] = measured
+    finally:
+        get_pool().checkin(driver)
+    return results
+
+
+def format_table(results):
+    """Return mean evaluation cost per locator and strategy, over snapshots where it was found."""
+    lines = [f"{'locator':<36}{'strategy':<15}{'mean us':>9}{'found':>7}{'same':>6}"]
+    for name, strategies in sorted(results.items()):
+        for strategy, snapshots in strategies.items():
+            found = [measured for measured in snapshots.values() if measured['found']]
+            mean = sum(measured['micros'] for measured in snapshots.values()) / len(snapshots)
+            same = all(measured['matches'] for measured in found)
+            lines.append(f"{name:<36}{strategy:<15}{mean:>9.1f}{len(found):>7}{'yes' if same else 'NO':>6}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Capture snapshots or benchmark the locators against them."""
+    parser = argparse.ArgumentParser(description='Benchmark locator strategies against DOM snapshots.')
+    parser.add_argument('--snapshot-dir', default=default_snapshot_dir)
+    parser.add_argument('--capture', action='store_true', help='Run the journey and save new snapshots')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='Write the raw results to this JSON file')
+    args = parser.parse_args(argv)
+    try:
+        if args.capture:
+            capture_snapshots(args.snapshot_dir)
+        results = benchmark(args.snapshot_dir, args.iterations)
+    finally:
+        get_pool().close()
+    print(format_table(results))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
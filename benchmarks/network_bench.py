@@ -0,0 +1,143 @@
+"""
+Booking journey under emulated network conditions.
+
+The journey is run step by step under each network profile, emulated
+by the browser (Network.emulateNetworkConditions) once the application
+has loaded. The result is a matrix of step durations per profile: steps
+that slow down with latency are bound by backend round trips, steps that
+do not are bound by rendering and the page's own timers. The offline
+profile shows which steps need the network at all, and failures show
+where the page-object timeouts stop holding.
+
+By default the application is served from the local replay stand-in,
+so only the emulated conditions vary between profiles:
+
+    python -m benchmarks.network_bench --runs 3 --virtual-time
+    python -m benchmarks.network_bench --profiles fast-3g slow-3g --backend live
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from data import data
+from pages.scenarios import Journey, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.browser_profiles import profiles
+from utilities.replay_server import ReplayServer
+from utilities.session_pool import configure_pool
+from utilities.stats import summarize
+
+default_output = '.urban_routes/network.json'
+
+# Round-trip latency in ms, download and upload throughput in bytes/s (-1: unthrottled)
+network_profiles = {
+    'unthrottled': {'offline': False, 'latency': 0, 'downloadThroughput': -1, 'uploadThroughput': -1},
+    'far-region': {'offline': False, 'latency': 150, 'downloadThroughput': -1, 'uploadThroughput': -1},
+    'cable': {'offline': False, 'latency': 28, 'downloadThroughput': 5_000_000 // 8,
+              'uploadThroughput': 1_000_000 // 8},
+    'fast-3g': {'offline': False, 'latency': 563, 'downloadThroughput': 1_440_000 // 8,
+                'uploadThroughput': 675_000 // 8},
+    'slow-3g': {'offline': False, 'latency': 2000, 'downloadThroughput': 400_000 // 8,
+                'uploadThroughput': 400_000 // 8},
+    'offline': {'offline': True, 'latency': 0, 'downloadThroughput': -1, 'uploadThroughput': -1},
+}
+
+
+def emulate(driver, conditions):
+    """Apply network conditions to the driver's page."""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.emulateNetworkConditions', conditions)
+
+
+def run_profile(conditions, runs, virtual_time=False, browser_profile=None):
+    """
+    Run the journey step by step under one set of network conditions.
+
+    Args:
+        conditions: Network.emulateNetworkConditions parameters
+        runs: Number of journeys
+        virtual_time: Fast-forward the car search countdown
+        browser_profile: Name of the browser profile to launch
+
+    Returns:
+        Dictionary with the per-step duration summaries and the failures
+    """
+    pool = configure_pool(factory=profiles[browser_profile or data.browser_profile])
+    durations = {}
+    failures = []
+    try:
+        for _ in range(runs):
+            # The pool loads the application unthrottled, the journey runs throttled
+            driver = pool.checkout()
+            try:
+                emulate(driver, conditions)
+                journey = Journey(UrbanRoutesPage(driver, virtual_time=virtual_time))
+                for name in steps:
+                    start = time.perf_counter()
+                    try:
+                        journey.run(name)
+                    except Exception as error:
+                        failures.append(f'{name}: {type(error).__name__}: {error}'.splitlines()[0])
+                        break
+                    durations.setdefault(name, []).append(time.perf_counter() - start)
+            finally:
+                emulate(driver, network_profiles['unthrottled'])
+                pool.checkin(driver)
+    finally:
+        pool.close()
+    return {
+        'conditions': conditions,
+        'steps': {name: summarize(durations[name]) for name in steps if name in durations},
+        'failures': failures,
+    }
+
+
+def format_matrix(results):
+    """Return the step p50 durations as a step by profile text table."""
+    names = list(results)
+    lines = [f"{'step':<28}" + ''.join(f'{name:>13}' for name in names)]
+    for step in steps:
+        cells = []
+        for name in names:
+            measured = results[name]['steps'].get(step)
+            cells.append(f"{measured['p50']:>12.2f}s" if measured else f"{'failed':>13}")
+        lines.append(f'{step:<28}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Run the journey under every selected network profile and print the matrix."""
+    parser = argparse.ArgumentParser(description='Benchmark the journey under emulated network conditions.')
+    parser.add_argument('--profiles', nargs='+', choices=list(network_profiles), default=list(network_profiles))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--backend', choices=('live', 'record', 'replay'), default='replay',
+                        help='Serve the application from the stand-in (default) or use the live app')
+    parser.add_argument('--browser-profile', choices=sorted(profiles), default=data.browser_profile)
+    parser.add_argument('--virtual-time', action='store_true')
+    parser.add_argument('--output', default=default_output)
+    args = parser.parse_args(argv)
+
+    backend = None
+    if args.backend != 'live':
+        backend = ReplayServer(data.backend_archive, args.backend).start()
+        data.urban_routes_url = backend.url + data.urban_routes_path
+    try:
+        results = {name: run_profile(network_profiles[name], args.runs, args.virtual_time, args.browser_profile)
+                   for name in args.profiles}
+    finally:
+        if backend is not None:
+            backend.stop()
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(format_matrix(results))
+    for name, result in results.items():
+        for failure in result['failures']:
+            print(f'FAILED [{name}] {failure}')
+    if backend is not None and backend.misses:
+        print(f'{len(backend.misses)} requests were not found in {backend.archive.directory}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
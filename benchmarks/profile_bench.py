@@ -0,0 +1,90 @@
+"""
+Startup time, memory and pass/fail of each browser profile.
+
+Every profile launches a few browsers, each of which opens the
+application and runs the whole booking journey. The report lists the
+startup time and resident memory per profile and whether its journeys
+passed, to pick the cheapest configuration that still runs the suite:
+
+    python -m benchmarks.profile_bench --launches 3 --virtual-time
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from data import data
+from pages.scenarios import Journey, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.browser_profiles import profiles, resident_memory
+from utilities.stats import summarize
+
+
+def benchmark_profile(profile, launches, virtual_time=False):
+    """
+    Launch browsers with a profile and run the journey on each.
+
+    Args:
+        profile: BrowserProfile to measure
+        launches: Number of browsers to launch
+        virtual_time: Fast-forward the car search countdown
+
+    Returns:
+        Dictionary with startup, resident memory after the journey,
+        journey time and failures
+    """
+    memory = []
+    journeys = []
+    failures = []
+    for _ in range(launches):
+        driver = profile.launch()
+        try:
+            driver.get(data.urban_routes_url)
+            start = time.perf_counter()
+            Journey(UrbanRoutesPage(driver, virtual_time=virtual_time)).run(*steps)
+            journeys.append(time.perf_counter() - start)
+            rss = resident_memory(driver)
+            if rss is not None:
+                memory.append(rss / 2 ** 20)
+        except Exception as error:
+            failures.append(f'{type(error).__name__}: {error}'.splitlines()[0])
+        finally:
+            driver.quit()
+    return {
+        'startup': summarize(profile.startup_times),
+        'memory_mb': summarize(memory),
+        'journey': summarize(journeys),
+        'failures': failures,
+    }
+
+
+def format_table(results):
+    """Format the per-profile results as a text table."""
+    lines = [f"{'profile':<10}{'startup':>10}{'RSS MB':>10}{'journey':>10}  result"]
+    for name, result in results.items():
+        status = 'passed' if not result['failures'] else f"{len(result['failures'])} failed"
+        lines.append(f"{name:<10}{result['startup']['p50']:>10.2f}{result['memory_mb']['p50']:>10.0f}"
+                     f"{result['journey']['p50']:>10.2f}  {status}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Measure the selected browser profiles and print the comparison."""
+    parser = argparse.ArgumentParser(description='Compare browser profiles.')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(profiles), default=['lean', 'full'],
+                        help='Profiles to measure (default: lean full)')
+    parser.add_argument('--launches', type=int, default=3)
+    parser.add_argument('--virtual-time', action='store_true')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {name: benchmark_profile(profiles[name], args.launches, args.virtual_time)
+               for name in args.profiles}
+    print(format_table(results))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 1 if any(result['failures'] for result in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,18 +5,44 @@ This module contains all test data used across the test suite,
 including URLs, addresses, contact information, and payment details.
 
 Attributes:
-    urban_routes_url: Base URL of the Urban Routes application
+    backend_url: Origin of the real Urban Routes application
+    backend_mode: 'live' to use backend_url, 'record' or 'replay' to go
+        through the local stand-in (env URBAN_ROUTES_BACKEND)
+    backend_archive: Directory of the recorded traffic archive
+        (env URBAN_ROUTES_ARCHIVE)
+    browser_profile: Name of the browser profile the suite launches,
+        see utilities.browser_profiles (env URBAN_ROUTES_PROFILE)
+    cdp_endpoint: DevTools endpoint of the browser for the asyncio page
+        object, a websocket URL or host:port, when the session does not
+        expose a reachable one (env URBAN_ROUTES_CDP_ENDPOINT)
+    urban_routes_path: Path and query of the application page
+    urban_routes_url: Base URL of the Urban Routes application, pointed
+        at the local stand-in when it is running
     address_from: Pickup location address
     address_to: Destination address
     phone_number: Phone number for verification
     card_number: Credit card number for payment
     card_code: Credit card CVV code
     message_for_driver: Comment text for the driver
+    performance_budgets: Front-end metric limits per page-object step,
+        '*' applying to every step (see utilities.performance_monitor)
 """
+import os
 
-urban_routes_url = 'https://cnt-c1a077da-9736-4f4a-b7a5-1c4417659b03.containerhub.tripleten-services.com?lng=en'
+backend_url = 'https://cnt-c1a077da-9736-4f4a-b7a5-1c4417659b03.containerhub.tripleten-services.com'
+backend_mode = os.environ.get('URBAN_ROUTES_BACKEND', 'live')
+backend_archive = os.environ.get('URBAN_ROUTES_ARCHIVE', 'recordings/urban_routes')
+browser_profile = os.environ.get('URBAN_ROUTES_PROFILE', 'full')
+cdp_endpoint = os.environ.get('URBAN_ROUTES_CDP_ENDPOINT')
+urban_routes_path = '/?lng=en'
+urban_routes_url = backend_url + urban_routes_path
 address_from = 'East 2nd Street, 601'
 address_to = '1300 1st St'
 phone_number = '+1 123 123 12 12'
 (card_number, card_code) = '1234 5678 9100', '111'
 message_for_driver = 'I am wearing red'
+performance_budgets = {
+    '*': {'long_task_max': 200, 'layout_shift': 0.1},
+    'click_on_payment_method_button': {'long_task_max': 100},
+    'click_on_add_card_button': {'long_task_max': 100},
+}
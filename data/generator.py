@@ -0,0 +1,59 @@
+"""
+Synthetic booking data for load runs.
+
+bookings() lazily yields valid, varied booking records with the same
+attribute names as the data module, so a Booking can be used wherever
+the journey reads its test data from data.py.
+"""
+import itertools
+import random
+from collections import namedtuple
+from data import data
+
+Booking = namedtuple('Booking', ['address_from', 'address_to', 'phone_number',
+                                 'card_number', 'card_code', 'message_for_driver'])
+
+addresses = [
+    data.address_from,
+    data.address_to,
+    'East 2nd Street, 1',
+    'East 2nd Street, 250',
+    '1st St, 500',
+    '1st St, 1000',
+    'Bedford Avenue, 120',
+    'Broadway, 1500',
+]
+
+messages = [
+    data.message_for_driver,
+    'I am wearing a blue jacket',
+    'Please call when you arrive',
+    'I will be at the main entrance',
+    'Travelling with a small dog',
+    'Please wait a couple of minutes',
+]
+
+
+def bookings(seed=None, count=None):
+    """
+    Yield synthetic booking records lazily.
+
+    Args:
+        seed: Seed for reproducible sequences
+        count: Number of records to yield, unlimited if None
+
+    Yields:
+        Booking records with distinct pickup and destination addresses
+    """
+    rng = random.Random(seed)
+    for _ in itertools.repeat(None) if count is None else range(count):
+        address_from, address_to = rng.sample(addresses, 2)
+        yield Booking(
+            address_from=address_from,
+            address_to=address_to,
+            phone_number='+1 {} {} {} {}'.format(rng.randint(100, 999), rng.randint(100, 999),
+                                                 rng.randint(10, 99), rng.randint(10, 99)),
+            card_number=' '.join(f'{rng.randint(0, 9999):04d}' for _ in range(3)),
+            card_code=f'{rng.randint(0, 999):03d}',
+            message_for_driver=rng.choice(messages),
+        )
@@ -0,0 +1,308 @@
+"""
+Asyncio counterpart of the UrbanRoutesPage page object.
+
+The page is driven over a CDP websocket instead of chromedriver's HTTP
+API. Each interaction is one Runtime.evaluate call that waits for its
+element inside the page (woken by DOM mutations) and then acts on it,
+and independent interactions, such as filling the card number and the
+card code or reading several values for assertions, are in flight at
+the same time. A single event loop can drive several sessions.
+"""
+import asyncio
+import json
+from data import data
+from pages.locators import script_locator
+from pages.resolver import FIND_ELEMENT, SET_VALUE
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities.cdp_client import CDPError, connect_browser
+from utilities.network_capture import CAPTURE_HOOK, START_CAPTURE, STOP_CAPTURE, WAIT_FOR_RESPONSE
+from utilities.retrieve_code import phone_code_pattern
+
+_ACT = FIND_ELEMENT + SET_VALUE + """
+var locator = arguments[0], condition = arguments[1], action = arguments[2], value = arguments[3];
+var timeout = arguments[4], done = arguments[arguments.length - 1];
+var finished = false, observer = null, timer = null, interval = null;
+function perform(element) {
+    switch (action) {
+        case 'none': return null;
+        case 'click': element.click(); return null;
+        case 'fill': setValue(element, value); return element.value === value;
+        case 'focus': element.focus(); if (element.select) { element.select(); } return null;
+        case 'blur': element.blur(); return null;
+        case 'text': return (element.innerText || '').trim();
+        case 'property': return element[value];
+        default: throw new Error('Unsupported action: ' + action);
+    }
+}
+function finish(met, element) {
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearTimeout(timer);
+    clearInterval(interval);
+    done({met: met, result: met && element ? perform(element) : null});
+}
+function check() {
+    if (finished) { return; }
+    var state = elementState(findLocator(locator));
+    if (conditionHolds(state, {state: condition})) { finish(true, state && state.element); }
+}
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    interval = setInterval(check, 250);
+    timer = setTimeout(function () { finish(false, null); }, timeout);
+}
+"""
+
+
+class AsyncUrbanRoutesPage:
+    """
+    Async page object for the Urban Routes application.
+
+    Locators are shared with UrbanRoutesPage. Methods mirror the sync
+    page object but are coroutines; helpers that touch independent
+    elements run their commands concurrently.
+    """
+
+    def __init__(self, connection, timeout=5):
+        """
+        Initialize the page with a CDP connection to the application page.
+
+        Args:
+            connection: CDPConnection to a page target, or a CDPSession
+                of a page attached through the browser connection
+            timeout: Seconds to wait for an element
+        """
+        self.connection = connection
+        self.timeout = timeout
+        self.locators = UrbanRoutesPage
+        # Browser connection opened by attach(), closed with the page
+        self._browser = None
+        # Key events go to the focused element, so typing is never concurrent
+        self._keyboard = asyncio.Lock()
+
+    @classmethod
+    async def attach(cls, driver, timeout=5, endpoint=None):
+        """
+        Connect to the page a Chrome WebDriver session is showing.
+
+        The browser is reached through the DevTools endpoint configured in
+        data.cdp_endpoint, the se:cdp capability of a Selenium Grid session
+        or the debugger address of a local Chrome, and the page target is
+        attached over that connection.
+
+        Args:
+            driver: Chrome WebDriver instance, local or remote
+            timeout: Seconds to wait for an element
+            endpoint: DevTools endpoint, defaults to data.cdp_endpoint
+
+        Raises:
+            CDPError: If no endpoint is reachable or the browser has no page
+        """
+        connection = await connect_browser(driver, endpoint or data.cdp_endpoint)
+        try:
+            targets = (await connection.send('Target.getTargets'))['targetInfos']
+            pages = [target for target in targets if target['type'] == 'page']
+            if not pages:
+                raise CDPError('The browser has no page target')
+            url = driver.current_url
+            target = ([target for target in pages if target['url'] == url] or pages)[0]
+            attached = await connection.send('Target.attachToTarget', {
+                'targetId': target['targetId'], 'flatten': True})
+        except Exception:
+            await connection.close()
+            raise
+        page = cls(connection.session(attached['sessionId']), timeout)
+        page._browser = connection
+        return page
+
+    async def _evaluate(self, script, *args, asynchronous=False):
+        """
+        Run a WebDriver-style script in the page and return its result.
+
+        Args:
+            script: Function body using arguments[...]; asynchronous scripts
+                receive their completion callback as the last argument
+            *args: JSON-serializable arguments
+            asynchronous: Whether the script completes through the callback
+        """
+        arguments = json.dumps(list(args))
+        if asynchronous:
+            expression = (f'new Promise(function (resolve) {{ (function () {{ {script} }})'
+                          f'.apply(null, {arguments}.concat([resolve])); }})')
+        else:
+            expression = f'(function () {{ {script} }}).apply(null, {arguments})'
+        response = await self.connection.send('Runtime.evaluate', {
+            'expression': expression, 'returnByValue': True, 'awaitPromise': True})
+        if 'exceptionDetails' in response:
+            details = response['exceptionDetails']
+            raise CDPError(details.get('exception', {}).get('description', details.get('text')))
+        return response['result'].get('value')
+
+    async def _act(self, locator, condition, action='none', value=None, timeout=None):
+        """Wait for an element state, then act on the element in the same call."""
+        timeout = timeout or self.timeout
+        outcome = await self._evaluate(_ACT, script_locator(locator), condition, action, value,
+                                       int(timeout * 1000), asynchronous=True)
+        if not outcome['met']:
+            raise asyncio.TimeoutError(f'{locator} not {condition} after {timeout}s')
+        return outcome['result']
+
+    async def _click(self, locator):
+        await self._act(locator, 'clickable', 'click')
+
+    async def _fill(self, locator, value):
+        """Set a field's value, typing it key by key if the page did not accept it (e.g. masked inputs)."""
+        if not await self._act(locator, 'visible', 'fill', value):
+            await self._type(locator, value)
+
+    async def _type(self, locator, value):
+        """Replace a field's value with real key events, like send_keys, then blur the field."""
+        async with self._keyboard:
+            await self._act(locator, 'visible', 'focus')
+            for character in value:
+                await self.connection.send('Input.dispatchKeyEvent', {'type': 'keyDown', 'text': character})
+                await self.connection.send('Input.dispatchKeyEvent', {'type': 'keyUp'})
+            # Like fill_form, e.g. the card code only enables "Add" once it loses focus
+            await self._act(locator, 'present', 'blur')
+
+    async def _text(self, locator):
+        return await self._act(locator, 'visible', 'text')
+
+    async def _property(self, locator, name, condition='present'):
+        return await self._act(locator, condition, 'property', name)
+
+    async def open(self, url=None):
+        """Navigate to the application and wait for it to load."""
+        await self.connection.send('Page.enable')
+        loaded = asyncio.get_running_loop().create_future()
+        self.connection.on('Page.loadEventFired', lambda _: loaded.done() or loaded.set_result(True))
+        await self.connection.send('Page.navigate', {'url': url or data.urban_routes_url})
+        await asyncio.wait_for(loaded, 30)
+
+    async def close(self):
+        """Close the CDP connection, and the browser connection opened by attach()."""
+        await self.connection.close()
+        if self._browser is not None:
+            await self._browser.close()
+
+    # Route methods
+    async def set_route(self, from_address, to_address):
+        """Set both pickup and destination addresses concurrently."""
+        await asyncio.gather(self._fill(self.locators.from_field, from_address),
+                             self._fill(self.locators.to_field, to_address))
+
+    async def get_route(self):
+        """Return the pickup and destination field values."""
+        return await asyncio.gather(self._property(self.locators.from_field, 'value'),
+                                    self._property(self.locators.to_field, 'value'))
+
+    async def click_on_call_taxi_button(self):
+        """Click the 'Call a taxi' button to proceed with booking."""
+        await self._click(self.locators.call_taxi_button)
+
+    # Fare selection methods
+    async def click_on_comfort_fare(self):
+        """Select the Comfort fare option."""
+        await self._click(self.locators.comfort_fare)
+
+    async def get_comfort_fare_text(self):
+        """Return the text of the Comfort fare option."""
+        return await self._text(self.locators.comfort_fare)
+
+    # Phone number methods
+    async def add_phone_number(self, phone_number):
+        """Enter the phone number, request the SMS code and confirm it."""
+        await self._click(self.locators.phone_number_button)
+        await self._fill(self.locators.phone_number_field, phone_number)
+        capture_id = await self._evaluate(START_CAPTURE, [phone_code_pattern], ['response'], 50)
+        try:
+            await self._click(self.locators.next_button)
+            response = await asyncio.wait_for(
+                self._evaluate(WAIT_FOR_RESPONSE, phone_code_pattern, 0, capture_id, int(self.timeout * 1000),
+                               asynchronous=True), self.timeout + 5)
+        finally:
+            await self._evaluate(STOP_CAPTURE, capture_id)
+        if not response:
+            raise CDPError('No phone code response was captured')
+        await self._fill(self.locators.sms_code, ''.join(x for x in response['body'] if x.isdigit()))
+        await self._click(self.locators.sms_confirmation_button)
+
+    async def get_phone_number_after_confirmation(self):
+        """Get the displayed phone number after successful verification."""
+        return await self._text(self.locators.phone_number_display_text)
+
+    # Payment method methods
+    async def add_card(self, card_number, card_code):
+        """Open the payment picker and add a card, filling both card fields concurrently."""
+        await self._click(self.locators.payment_method_button)
+        await self._click(self.locators.add_card_button)
+        await asyncio.gather(self._fill(self.locators.card_number_field, card_number),
+                             self._fill(self.locators.card_code_field, card_code))
+        await self._click(self.locators.add_card_submit_button)
+
+    async def is_new_card_added(self):
+        """Return whether the added card is displayed in the payment list."""
+        await self._act(self.locators.new_card_added, 'visible')
+        return True
+
+    async def click_on_payment_method_close_button(self):
+        """Close the payment modal."""
+        await self._click(self.locators.payment_method_close_button)
+
+    # Comment for driver methods
+    async def set_comment_for_driver_field(self, message):
+        """Enter a comment for the driver."""
+        await self._fill(self.locators.comment_for_driver_field, message)
+
+    async def get_comment_for_driver_value(self):
+        """Get the current value of the driver comment field."""
+        return await self._property(self.locators.comment_for_driver_field, 'value')
+
+    # Order requirements methods
+    async def click_on_blanket_and_handkerchiefs_slider(self):
+        """Toggle the blanket and handkerchiefs option ON."""
+        await self._click(self.locators.blanket_and_handkerchiefs_slider)
+
+    async def click_on_ice_cream_counter_plus_button(self):
+        """Increment the ice cream quantity by clicking the plus button."""
+        await self._click(self.locators.ice_cream_counter_plus_button)
+
+    async def get_requirements(self):
+        """Return the blanket toggle state and the ice cream count."""
+        return await asyncio.gather(
+            self._property(self.locators.blanket_and_handkerchiefs_input, 'checked'),
+            self._text(self.locators.ice_cream_counter_plus_value))
+
+    # Booking methods
+    async def click_on_book_taxi_button(self):
+        """Click the 'Book taxi' button to start the taxi search."""
+        await self._click(self.locators.book_taxi_button)
+
+    async def wait_for_driver_details(self, timeout=40):
+        """Wait for the search timer to disappear and the driver details to appear."""
+        await self._act(self.locators.car_search_timer, 'invisible', timeout=timeout)
+        await self._act(self.locators.driver_details, 'visible')
+        return True
+
+    async def run_journey(self, booking=data):
+        """
+        Run the whole booking journey with the given booking data.
+
+        Args:
+            booking: Booking record or the data module
+        """
+        await self._evaluate(CAPTURE_HOOK)
+        await self.set_route(booking.address_from, booking.address_to)
+        await self.click_on_call_taxi_button()
+        await self.click_on_comfort_fare()
+        await self.add_phone_number(booking.phone_number)
+        await self.add_card(booking.card_number, booking.card_code)
+        await self.click_on_payment_method_close_button()
+        await asyncio.gather(self.set_comment_for_driver_field(booking.message_for_driver),
+                             self.click_on_blanket_and_handkerchiefs_slider())
+        await self.click_on_ice_cream_counter_plus_button()
+        await self.click_on_ice_cream_counter_plus_button()
+        await self.click_on_book_taxi_button()
+        await self.wait_for_driver_details()
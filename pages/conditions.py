@@ -0,0 +1,109 @@
+"""
+Locator-aware wait conditions.
+
+These mirror the selenium ``expected_conditions`` used by the page
+object and can still be passed to a plain WebDriverWait. In addition
+they expose the locator and the element state they wait for, so a
+SectionWait can evaluate them inside the page, against a batch of
+elements resolved in a single script execution.
+"""
+from selenium.common import StaleElementReferenceException
+from selenium.webdriver.support import expected_conditions
+
+
+class LocatorCondition:
+    """Wait condition on the state of the element found by a locator."""
+
+    def __init__(self, locator, state, expected_condition, text=None):
+        """
+        Initialize the condition.
+
+        Args:
+            locator: Locator tuple, e.g. (By.ID, 'from')
+            state: One of 'present', 'visible', 'clickable', 'invisible',
+                'text_contains' or 'text_equals'
+            expected_condition: Equivalent selenium expected condition
+            text: Expected element text for the text states
+        """
+        self.locator = locator
+        self.state = state
+        self.text = text
+        self._expected = expected_condition
+
+    def __call__(self, driver):
+        """Evaluate the condition the same way selenium's condition does."""
+        return self._expected(driver)
+
+    def accepts(self, element_state):
+        """
+        Check the condition against a resolved element state.
+
+        Args:
+            element_state: Dictionary with element, visible and enabled keys,
+                or None when the element is not in the page
+
+        Returns:
+            True if the condition holds for that state
+        """
+        if self.state == 'invisible':
+            return element_state is None or not element_state['visible']
+        if element_state is None:
+            return False
+        if self.state == 'visible':
+            return element_state['visible']
+        if self.state == 'clickable':
+            return element_state['visible'] and element_state['enabled']
+        if self.state == 'text_contains':
+            return self.text in element_state['text']
+        if self.state == 'text_equals':
+            return element_state['text'] == self.text
+        return True
+
+    def as_script_argument(self):
+        """Return the condition in the form understood by the in-page wait."""
+        return {'state': self.state, 'text': self.text}
+
+    def result(self, element_state):
+        """Return what the wait yields once the condition holds."""
+        if self.state in ('invisible', 'text_contains', 'text_equals'):
+            return True
+        return element_state['element']
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.locator!r}, {self.state!r})'
+
+
+def presence_of_element_located(locator):
+    """Wait for the element to be present in the DOM."""
+    return LocatorCondition(locator, 'present', expected_conditions.presence_of_element_located(locator))
+
+
+def visibility_of_element_located(locator):
+    """Wait for the element to be present and visible."""
+    return LocatorCondition(locator, 'visible', expected_conditions.visibility_of_element_located(locator))
+
+
+def element_to_be_clickable(locator):
+    """Wait for the element to be visible and enabled."""
+    return LocatorCondition(locator, 'clickable', expected_conditions.element_to_be_clickable(locator))
+
+
+def invisibility_of_element_located(locator):
+    """Wait for the element to be hidden or removed from the DOM."""
+    return LocatorCondition(locator, 'invisible', expected_conditions.invisibility_of_element_located(locator))
+
+
+def text_to_be_present_in_element(locator, text_):
+    """Wait for the element text to contain the given text."""
+    return LocatorCondition(locator, 'text_contains',
+                            expected_conditions.text_to_be_present_in_element(locator, text_), text_)
+
+
+def element_text_to_be(locator, text_):
+    """Wait for the element text to be exactly the given text."""
+    def text_equals(driver):
+        try:
+            return driver.find_element(*locator).text == text_
+        except StaleElementReferenceException:
+            return False
+    return LocatorCondition(locator, 'text_equals', text_equals, text_)
@@ -0,0 +1,49 @@
+"""
+Scoped locators.
+
+A scoped locator finds its element in two stages: first the container
+(a CSS selector filtered by the text it contains), then the element
+relative to that container. The container is cached in the page and
+reused while it stays attached to the document, so later lookups only
+query the container's subtree instead of evaluating an ancestor XPath
+against the whole document.
+
+A ScopedLocator is still a regular (By.XPATH, xpath) tuple, so code
+that unpacks locators into find_element or selenium's expected
+conditions keeps working with the equivalent XPath.
+"""
+from selenium.webdriver.common.by import By
+
+
+class ScopedLocator(tuple):
+    """Locator tuple resolved through a cached container element."""
+
+    def __new__(cls, container, text, child, xpath):
+        """
+        Create the locator.
+
+        Args:
+            container: CSS selector of the container candidates
+            text: Text the container must contain
+            child: CSS selector of the element inside the container
+            xpath: Equivalent document-wide XPath, used as fallback
+        """
+        locator = super().__new__(cls, (By.XPATH, xpath))
+        locator.container = container
+        locator.text = text
+        locator.child = child
+        return locator
+
+    def __getnewargs__(self):
+        return self.container, self.text, self.child, self[1]
+
+    def scope(self):
+        """Return the container lookup in the form understood by page scripts."""
+        return {'container': self.container, 'text': self.text, 'child': self.child}
+
+
+def script_locator(locator):
+    """Return a locator in the form understood by the page scripts."""
+    if isinstance(locator, ScopedLocator):
+        return [locator[0], locator[1], locator.scope()]
+    return list(locator)
@@ -0,0 +1,397 @@
+"""
+Batched locator resolution for page sections.
+
+All locators of a page section are resolved in one script execution
+that returns each element together with its visibility and enabled
+state. The results are cached per section, so waiting on the next
+element of the same section usually needs no browser round trip, and
+a wait that has to block does so inside the page, woken up by DOM
+mutations instead of polling the browser every half second. Several
+input fields can likewise be waited for and filled in a single call.
+"""
+import time
+from selenium.common import JavascriptException, StaleElementReferenceException, TimeoutException
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.wait import WebDriverWait
+from pages.locators import script_locator
+from utilities.script_timeouts import ensure_script_timeout
+from utilities.wait_timings import wait_key
+
+# Finds an element for a selenium locator strategy, relative to a root node,
+# or for a scoped locator through its cached container
+FIND_ELEMENT = """
+function findElement(by, value, root) {
+    root = root || document;
+    switch (by) {
+        case 'id':
+            return root === document ? document.getElementById(value)
+                : root.querySelector('#' + CSS.escape(value));
+        case 'css selector':
+            return root.querySelector(value);
+        case 'class name':
+            return root.getElementsByClassName(value)[0] || null;
+        case 'name':
+            return root.querySelector('[name="' + value.replace(/"/g, '\\\\"') + '"]');
+        case 'tag name':
+            return root.getElementsByTagName(value)[0] || null;
+        case 'xpath':
+            return document.evaluate(value, root, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        default:
+            throw new Error('Unsupported locator strategy: ' + by);
+    }
+}
+var containerCache = window.__urbanRoutesContainers || (window.__urbanRoutesContainers = {});
+function findContainer(scope) {
+    var key = scope.container + '|' + scope.text;
+    var cached = containerCache[key];
+    if (cached && cached.isConnected) { return cached; }
+    var candidates = document.querySelectorAll(scope.container);
+    for (var i = 0; i < candidates.length; i++) {
+        if (candidates[i].textContent.indexOf(scope.text) !== -1) {
+            containerCache[key] = candidates[i];
+            return candidates[i];
+        }
+    }
+    return null;
+}
+function findLocator(locator) {
+    if (locator[2]) {
+        var container = findContainer(locator[2]);
+        return container ? container.querySelector(locator[2].child) : null;
+    }
+    return findElement(locator[0], locator[1]);
+}
+// Like WebDriver's isDisplayed, a transparent or undisplayed ancestor hides the element
+function isShown(element) {
+    if (element.getClientRects().length === 0) { return false; }
+    var rect = element.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0
+        || window.getComputedStyle(element).visibility === 'hidden') { return false; }
+    for (var node = element; node && node.nodeType === 1; node = node.parentElement) {
+        var style = window.getComputedStyle(node);
+        if (style.display === 'none' || style.opacity === '0') { return false; }
+    }
+    return true;
+}
+function elementState(element) {
+    if (!element) { return null; }
+    return {element: element, visible: isShown(element), enabled: !element.disabled,
+            text: (element.innerText || '').trim()};
+}
+function conditionHolds(state, condition) {
+    switch (condition.state) {
+        case 'invisible': return !state || !state.visible;
+        case 'present': return !!state;
+        case 'visible': return !!state && state.visible;
+        case 'clickable': return !!state && state.visible && state.enabled;
+        case 'text_contains': return !!state && state.text.indexOf(condition.text) !== -1;
+        case 'text_equals': return !!state && state.text === condition.text;
+        default: throw new Error('Unsupported condition: ' + condition.state);
+    }
+}
+"""
+
+# Sets the value of an input the way a user edit would, so React-style
+# controlled inputs see input, change and blur events
+SET_VALUE = """
+function setValue(element, value) {
+    var prototype = element instanceof HTMLTextAreaElement
+        ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    element.focus();
+    Object.getOwnPropertyDescriptor(prototype, 'value').set.call(element, value);
+    element.dispatchEvent(new Event('input', {bubbles: true}));
+    element.dispatchEvent(new Event('change', {bubbles: true}));
+    element.blur();
+}
+"""
+
+_RESOLVE_SECTION = FIND_ELEMENT + """
+return arguments[0].map(function (locator) {
+    return elementState(findLocator(locator));
+});
+"""
+
+# Blocks until the condition holds, re-checking only when the DOM changes.
+# The low-frequency interval catches changes that are not DOM mutations,
+# such as CSS transitions finishing.
+_WAIT_FOR_SECTION = FIND_ELEMENT + """
+var locators = arguments[0], index = arguments[1], condition = arguments[2];
+var timeout = arguments[3], done = arguments[arguments.length - 1];
+var finished = false, observer = null, timer = null, interval = null;
+function resolve() {
+    return locators.map(function (locator) {
+        return elementState(findLocator(locator));
+    });
+}
+function finish(states, met) {
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearTimeout(timer);
+    clearInterval(interval);
+    done({states: states, met: met});
+}
+function check() {
+    if (finished) { return; }
+    var states = resolve();
+    if (conditionHolds(states[index], condition)) { finish(states, true); }
+}
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    interval = setInterval(check, 250);
+    timer = setTimeout(function () { finish(resolve(), false); }, timeout);
+}
+"""
+
+# Waits until every field is visible and enabled, then sets all of them in
+# the same call. Returns the indices of fields whose value the page did not
+# accept as set (e.g. masked inputs that reformat keystrokes).
+_FILL_FIELDS = FIND_ELEMENT + SET_VALUE + """
+var locators = arguments[0], values = arguments[1];
+var timeout = arguments[2], done = arguments[arguments.length - 1];
+var finished = false, observer = null, timer = null, interval = null;
+function finish(met, elements) {
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearTimeout(timer);
+    clearInterval(interval);
+    if (!met) { done({met: false, rejected: []}); return; }
+    var rejected = [];
+    elements.forEach(function (element, index) {
+        setValue(element, values[index]);
+        if (element.value !== values[index]) { rejected.push(index); }
+    });
+    done({met: true, rejected: rejected});
+}
+function check() {
+    if (finished) { return; }
+    var elements = [];
+    for (var i = 0; i < locators.length; i++) {
+        var state = elementState(findLocator(locators[i]));
+        if (!conditionHolds(state, {state: 'clickable'})) { return; }
+        elements.push(state.element);
+    }
+    finish(true, elements);
+}
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    interval = setInterval(check, 250);
+    timer = setTimeout(function () { finish(false, null); }, timeout);
+}
+"""
+
+
+class CachedElement(WebElement):
+    """
+    Element handed out from a section cache.
+
+    The page may have replaced the element since its section was
+    resolved. The first command failing with a stale element reference
+    resolves the locator again and is retried on the fresh element.
+    """
+
+    def __init__(self, element, refresh):
+        """
+        Wrap a cached element.
+
+        Args:
+            element: WebElement from the section cache
+            refresh: Callable returning a freshly resolved element
+        """
+        super().__init__(element.parent, element.id)
+        self._refresh = refresh
+
+    def _execute(self, command, params=None):
+        try:
+            return super()._execute(command, params)
+        except StaleElementReferenceException:
+            if self._refresh is None:
+                raise
+            refresh, self._refresh = self._refresh, None
+            self._id = refresh().id
+            return super()._execute(command, params)
+
+
+class SectionWait(WebDriverWait):
+    """
+    WebDriverWait that resolves whole page sections at once.
+
+    Conditions from pages.conditions that target a locator of a known
+    section are checked against the section cache first. On a miss a
+    single asynchronous script waits inside the page, driven by a
+    MutationObserver, until the condition holds, and returns the whole
+    resolved section to refresh the cache. An element is handed out
+    from the cache only once, and the cache is dropped whenever a
+    locator from another section is requested, so stale elements are
+    not reused across section transitions. An element from the cache
+    that went stale anyway drops the cache and is resolved again when
+    it is used. Any other condition falls back to regular polling.
+
+    With a timing store, the in-page wait on a locator uses the deadline
+    learned from its earlier waits, capped by the wait's own timeout, and
+    records how long the condition took to hold.
+    """
+
+    def __init__(self, driver, timeout, sections=None, timings=None, **kwargs):
+        """
+        Initialize the wait.
+
+        Args:
+            driver: Selenium WebDriver instance
+            timeout: Seconds to wait for a condition
+            sections: Dictionary mapping section name to its locator tuples
+            timings: Optional TimingStore to learn per-locator timeouts from
+            **kwargs: Extra WebDriverWait arguments
+        """
+        super().__init__(driver, timeout, **kwargs)
+        self.sections = sections or {}
+        self.timings = timings
+        self._section_of = {locator: name for name, locators in self.sections.items()
+                            for locator in locators}
+        self._section = None
+        self._cache = {}
+        self.resolutions = 0
+
+    def invalidate(self):
+        """Drop every cached element."""
+        self._section = None
+        self._cache = {}
+
+    def resolve(self, section):
+        """
+        Resolve every locator of a section in a single script execution.
+
+        Args:
+            section: Name of the section to resolve
+
+        Returns:
+            Dictionary mapping locator to its element state, or None
+        """
+        locators = self.sections[section]
+        states = self._driver.execute_script(_RESOLVE_SECTION, [script_locator(locator) for locator in locators])
+        self.resolutions += 1
+        self._section = section
+        self._cache = dict(zip(locators, states))
+        return self._cache
+
+    def with_timeout(self, timeout):
+        """Return a wait sharing this one's sections with another timeout."""
+        return SectionWait(self._driver, timeout, self.sections, self.timings, poll_frequency=self._poll,
+                           ignored_exceptions=self._ignored_exceptions)
+
+    def fill(self, values, message=''):
+        """
+        Wait for several input fields and set their values in one script execution.
+
+        Every value is set through the native value setter followed by
+        input, change and blur events, as a user edit would.
+
+        Args:
+            values: Dictionary mapping locator tuples to the values to set
+            message: Message of the TimeoutException
+
+        Returns:
+            List of locators whose value the page did not accept as set,
+            or every locator if the document was replaced while filling
+
+        Raises:
+            TimeoutException: If a field is not visible and enabled in time,
+                or the script itself did not finish
+        """
+        locators = list(values)
+        ensure_script_timeout(self._driver, self._timeout + 5)
+        try:
+            outcome = self._driver.execute_async_script(
+                _FILL_FIELDS, [script_locator(locator) for locator in locators],
+                [values[locator] for locator in locators], int(self._timeout * 1000))
+        except JavascriptException:
+            # The document was replaced while filling, no value is known to be set
+            outcome = {'met': True, 'rejected': range(len(locators))}
+        except TimeoutException:
+            self.invalidate()
+            raise
+        # Filling fields changes the state of the elements around them
+        self.invalidate()
+        if not outcome['met']:
+            raise TimeoutException(message)
+        return [locators[index] for index in outcome['rejected']]
+
+    def _wait_for_section(self, method, locators, timeout):
+        """
+        Run the in-page wait for a condition on one locator of a section.
+
+        Returns:
+            The script outcome, or None if the document was replaced while waiting
+
+        Raises:
+            TimeoutException: If the script itself did not finish
+        """
+        ensure_script_timeout(self._driver, timeout + 5)
+        try:
+            return self._driver.execute_async_script(
+                _WAIT_FOR_SECTION, [script_locator(item) for item in locators], locators.index(method.locator),
+                method.as_script_argument(), int(timeout * 1000))
+        except JavascriptException:
+            return None
+        except TimeoutException:
+            self.invalidate()
+            raise
+
+    def until(self, method, message=''):
+        """Wait until the condition holds, using the section cache when possible."""
+        locator = getattr(method, 'locator', None)
+        section = self._section_of.get(locator)
+        if section is None:
+            return super().until(method, message)
+        if section != self._section:
+            self.invalidate()
+        elif locator in self._cache and method.accepts(self._cache[locator]):
+            result = method.result(self._cache.pop(locator))
+            if not isinstance(result, WebElement):
+                return result
+
+            def refresh():
+                self.invalidate()
+                return self._wait_in_page(method, message)
+            return CachedElement(result, refresh)
+        return self._wait_in_page(method, message)
+
+    def _wait_in_page(self, method, message):
+        """
+        Wait inside the page for a condition on a section locator and refresh the section cache.
+
+        A wait missing its learned deadline gets a second deadline as long,
+        within the static timeout, so a case somewhat slower than any
+        recorded does not fail. Misses are recorded too, with the time
+        waited, so later deadlines widen.
+        """
+        locator = method.locator
+        section = self._section_of[locator]
+        locators = self.sections[section]
+        timeout, key = self._timeout, None
+        if self.timings is not None:
+            key = wait_key(locator, method.state)
+            timeout = self.timings.timeout(key, self._timeout)
+        start = time.perf_counter()
+        outcome = self._wait_for_section(method, locators, timeout)
+        missed = outcome is not None and not outcome['met'] and timeout < self._timeout
+        if missed:
+            grace = min(timeout, self._timeout - timeout)
+            outcome = self._wait_for_section(method, locators, grace)
+            timeout += grace
+        if outcome is None:
+            # The document was replaced while waiting, poll like a regular wait
+            self.invalidate()
+            return super().until(method, message)
+        self.resolutions += 1
+        self._section = section
+        self._cache = dict(zip(locators, outcome['states']))
+        if key is not None and (outcome['met'] or missed):
+            self.timings.record(key, time.perf_counter() - start)
+        if not outcome['met']:
+            raise TimeoutException(message or f'{method.state} {locator} not met after {timeout:.1f}s')
+        return method.result(self._cache.pop(locator))
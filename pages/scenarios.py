@@ -0,0 +1,284 @@
+"""
+Scenario layer for the Urban Routes booking journey.
+
+The journey is split into named steps. Each step declares the steps
+it requires and knows how to perform itself on an UrbanRoutesPage, so
+a test only has to name the step it checks: every precondition can be
+replayed on a fresh browser, and the tests can run in any order or in
+separate worker processes. Steps read their input from a booking,
+either the data module or a record with the same attribute names.
+
+Steps can also register a check of the state they leave the page in.
+Only checked steps count as done when a journey starts from restored
+state, since the application does not keep all of its state in storage
+and cookies.
+"""
+from data import data
+from pages import conditions as EC
+
+
+class Step:
+    """A named journey step with the steps it requires."""
+
+    def __init__(self, name, action, requires=()):
+        self.name = name
+        self.action = action
+        self.requires = tuple(requires)
+        self.verify = None
+
+    def __repr__(self):
+        return f'Step({self.name!r}, requires={self.requires!r})'
+
+
+steps = {}
+
+
+def step(name, requires=()):
+    """Register the decorated function as the action of a journey step."""
+    def register(action):
+        steps[name] = Step(name, action, requires)
+        return action
+    return register
+
+
+def verifies(name):
+    """Register the decorated function as the check that the page shows a step as done."""
+    def register(verify):
+        steps[name].verify = verify
+        return verify
+    return register
+
+
+def resolve(*names):
+    """
+    Return the steps needed to reach the given steps, dependencies first.
+
+    Args:
+        *names: Names of the steps to reach
+
+    Returns:
+        List of step names in journey order, including the given steps
+
+    Raises:
+        KeyError: If a step name is not registered
+    """
+    needed = set()
+
+    def visit(name):
+        if name not in needed:
+            needed.add(name)
+            for required in steps[name].requires:
+                visit(required)
+
+    for name in names:
+        visit(name)
+    return [name for name in steps if name in needed]
+
+
+@step('route')
+def set_route(page, booking):
+    """Enter the pickup and destination addresses."""
+    page.fill_route(booking.address_from, booking.address_to)
+
+
+@verifies('route')
+def route_shown(page, booking):
+    """Check that both addresses are entered."""
+    return (page.shows(EC.visibility_of_element_located(page.from_field))
+            and page.get_from() == booking.address_from and page.get_to() == booking.address_to)
+
+
+@step('comfort_fare', requires=('route',))
+def select_comfort_fare(page, booking):
+    """Open the taxi panel and select the Comfort fare."""
+    page.click_on_call_taxi_button()
+    page.click_on_comfort_fare()
+
+
+@verifies('comfort_fare')
+def comfort_fare_shown(page, booking):
+    """Check that the order form of the selected fare is open."""
+    return page.shows(EC.visibility_of_element_located(page.phone_number_button))
+
+
+@step('phone', requires=('comfort_fare',))
+def add_phone_number(page, booking):
+    """Add and verify the phone number through the SMS code."""
+    page.click_on_phone_number_button()
+    page.set_phone_number_field(booking.phone_number)
+    page.click_on_next_button()
+    page.set_sms_code()
+    page.click_on_confirmation_button()
+
+
+@verifies('phone')
+def phone_number_shown(page, booking):
+    """Check that the verified phone number is displayed."""
+    return page.shows(EC.text_to_be_present_in_element(page.phone_number_display_text, booking.phone_number))
+
+
+@step('card', requires=('comfort_fare',))
+def add_credit_card(page, booking):
+    """Add a credit card as payment method and close the payment modal."""
+    page.click_on_payment_method_button()
+    page.click_on_add_card_button()
+    page.set_card(booking.card_number, booking.card_code)
+    page.click_on_add_card_submit_button()
+    page.click_on_payment_method_close_button()
+
+
+@verifies('card')
+def credit_card_shown(page, booking):
+    """Check that the payment method button names the card as the selected method."""
+    return page.shows(EC.text_to_be_present_in_element(page.payment_method_button, 'Card'))
+
+
+@step('comment', requires=('comfort_fare',))
+def add_comment_for_driver(page, booking):
+    """Enter the comment for the driver."""
+    page.fill_comment_for_driver(booking.message_for_driver)
+
+
+@verifies('comment')
+def comment_shown(page, booking):
+    """Check that the comment for the driver is entered."""
+    return (page.shows(EC.visibility_of_element_located(page.comment_for_driver_field))
+            and page.get_comment_for_driver_value() == booking.message_for_driver)
+
+
+@step('blanket_and_handkerchiefs', requires=('comfort_fare',))
+def add_blanket_and_handkerchiefs(page, booking):
+    """Enable the blanket and handkerchiefs requirement."""
+    page.click_on_blanket_and_handkerchiefs_slider()
+
+
+@verifies('blanket_and_handkerchiefs')
+def blanket_and_handkerchiefs_shown(page, booking):
+    """Check that the blanket and handkerchiefs requirement is enabled."""
+    return (page.shows(EC.presence_of_element_located(page.blanket_and_handkerchiefs_input))
+            and page.get_blanket_slider_input().is_selected())
+
+
+@step('ice_cream', requires=('comfort_fare',))
+def add_ice_cream(page, booking):
+    """Add two ice creams to the order."""
+    page.click_on_ice_cream_counter_plus_button()
+    page.click_on_ice_cream_counter_plus_button()
+
+
+@verifies('ice_cream')
+def ice_cream_shown(page, booking):
+    """Check that two ice creams are ordered."""
+    return page.shows(EC.element_text_to_be(page.ice_cream_counter_plus_value, '2'))
+
+
+@step('booking', requires=('phone',))
+def book_taxi(page, booking):
+    """Book the taxi and start the car search."""
+    page.click_on_book_taxi_button()
+
+
+@verifies('booking')
+def booking_shown(page, booking):
+    """Check that the car search or its result is displayed."""
+    return (page.shows(EC.visibility_of_element_located(page.car_search_timer))
+            or page.shows(EC.visibility_of_element_located(page.driver_details)))
+
+
+@step('driver_info', requires=('booking',))
+def wait_for_driver(page, booking):
+    """Wait for the car search to finish and the driver to be assigned."""
+    page.get_driver_details_after_timer()
+
+
+@verifies('driver_info')
+def driver_info_shown(page, booking):
+    """Check that the assigned driver is displayed."""
+    return page.shows(EC.visibility_of_element_located(page.driver_details))
+
+
+class Journey:
+    """
+    Tracks which journey steps have been completed in a browser session.
+
+    A test may continue an existing journey when every step it requires
+    is already done and its own step is not; otherwise the browser has
+    to be reset and the required steps replayed. With a checkpoint store,
+    a fresh journey starts from the most advanced saved checkpoint and
+    saves a new one after every step. Restored steps only count as done
+    when the page shows them; the others are replayed.
+    """
+
+    def __init__(self, page, checkpoints=None, booking=data):
+        """
+        Initialize an empty journey on a freshly loaded page.
+
+        Args:
+            page: UrbanRoutesPage showing a fresh application page
+            checkpoints: Optional CheckpointStore to restore and save state
+            booking: Booking data, defaults to the data module
+        """
+        self.page = page
+        self.checkpoints = checkpoints
+        self.booking = booking
+        self.completed = []
+        self.failed = False
+
+    def can_continue(self, name):
+        """Return True if the step can run on the current journey state."""
+        if self.failed:
+            return False
+        done = set(self.completed)
+        return name not in done and set(resolve(*steps[name].requires)) <= done
+
+    def run(self, *names):
+        """Perform the given steps and any missing preconditions in order."""
+        needed = resolve(*names)
+        if not self.completed and self.checkpoints is not None:
+            checkpoint = self.checkpoints.best(self.page.driver, needed)
+            if checkpoint is not None:
+                restored = self.checkpoints.restore(self.page.driver, checkpoint)
+                self.page.wait.invalidate()
+                self.completed = self.shown(restored)
+        for name in needed:
+            if name not in self.completed:
+                try:
+                    steps[name].action(self.page, self.booking)
+                except Exception:
+                    self.failed = True
+                    raise
+                self.mark(name)
+
+    def shown(self, names):
+        """
+        Return the given steps the page shows as done.
+
+        A step counts only if it has a check, the check passes and every
+        step it requires is done or counts too. Steps without a check are
+        never taken as done from restored state.
+
+        Args:
+            names: Names of the steps the page is expected to show
+
+        Returns:
+            List of confirmed step names in journey order
+        """
+        confirmed = []
+        for name in resolve(*names):
+            step = steps[name]
+            if name in names and step.verify is not None \
+                    and set(step.requires) <= set(confirmed) | set(self.completed) \
+                    and step.verify(self.page, self.booking):
+                confirmed.append(name)
+        return confirmed
+
+    def prepare(self, name):
+        """Perform every precondition of the given step."""
+        self.run(*steps[name].requires)
+
+    def mark(self, name):
+        """Record a completed step, e.g. one performed by a test."""
+        if name not in self.completed:
+            self.completed.append(name)
+            if self.checkpoints is not None:
+                self.checkpoints.save(self.page.driver, self.completed)
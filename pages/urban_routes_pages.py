@@ -1,9 +1,13 @@
 from data import data
-from utilities.retrieve_code import retrieve_phone_code
+from pages import conditions as EC
+from pages.locators import ScopedLocator
+from pages.resolver import SectionWait
+from utilities.network_capture import NetworkCapture
+from utilities.retrieve_code import phone_code_pattern, retrieve_phone_code
+from utilities.virtual_clock import VirtualClock
+from selenium.common import TimeoutException
 from selenium.webdriver import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 
 class UrbanRoutesPage:
     """
@@ -47,35 +51,115 @@ class UrbanRoutesPage:
 
     # Locators - Order requirements section
     order_requirements_button = (By.CLASS_NAME, 'reqs-header')
-    blanket_and_handkerchiefs_slider = (By.XPATH,
-                                        "//div[contains(text(), 'Blanket and handkerchiefs')]"
-                                        "//ancestor::div[@class='r-sw-container']"
-                                        "//span[@class='slider round']"
-                                        )
-    blanket_and_handkerchiefs_input = (By.XPATH,
-                                       "//div[contains(text(), 'Blanket and handkerchiefs')]"
-                                       "//ancestor::div[@class='r-sw-container']"
-                                       "//input[@class='switch-input']")
-    ice_cream_counter_plus_button = (By.XPATH,
-                                       "//div[contains(text(), 'Ice cream')]"
-                                       "//ancestor::div[@class='r-counter-container']"
-                                       "//div[@class='counter-plus']")
-    ice_cream_counter_plus_value = (By.XPATH,
-                                       "//div[contains(text(), 'Ice cream')]"
-                                       "//ancestor::div[@class='r-counter-container']"
-                                       "//div[@class='counter-value']")
+    blanket_and_handkerchiefs_slider = ScopedLocator('div.r-sw-container', 'Blanket and handkerchiefs',
+                                                     'span.slider.round',
+                                                     "//div[contains(text(), 'Blanket and handkerchiefs')]"
+                                                     "//ancestor::div[@class='r-sw-container']"
+                                                     "//span[@class='slider round']")
+    blanket_and_handkerchiefs_input = ScopedLocator('div.r-sw-container', 'Blanket and handkerchiefs',
+                                                    'input.switch-input',
+                                                    "//div[contains(text(), 'Blanket and handkerchiefs')]"
+                                                    "//ancestor::div[@class='r-sw-container']"
+                                                    "//input[@class='switch-input']")
+    ice_cream_counter_plus_button = ScopedLocator('div.r-counter-container', 'Ice cream',
+                                                  'div.counter-plus',
+                                                  "//div[contains(text(), 'Ice cream')]"
+                                                  "//ancestor::div[@class='r-counter-container']"
+                                                  "//div[@class='counter-plus']")
+    ice_cream_counter_plus_value = ScopedLocator('div.r-counter-container', 'Ice cream',
+                                                 'div.counter-value',
+                                                 "//div[contains(text(), 'Ice cream')]"
+                                                 "//ancestor::div[@class='r-counter-container']"
+                                                 "//div[@class='counter-value']")
 
     # Locators - Booking section
     book_taxi_button = (By.CLASS_NAME, 'smart-button-main')
     car_search_timer = (By.CLASS_NAME, 'order-header-time')
     driver_details = (By.CLASS_NAME, 'order-btn-rating')
 
+    # Page sections - locators resolved together in one script execution
+    sections = {
+        'route': (from_field, to_field, call_taxi_button),
+        'fare': (comfort_fare,),
+        'phone': (phone_number_button, phone_number_field, next_button, sms_code,
+                  sms_confirmation_button, phone_number_display_text),
+        'payment': (payment_method_button, add_card_button, card_number_field, card_code_field,
+                    add_card_submit_button, new_card_added, payment_method_close_button),
+        'comment': (comment_for_driver_field,),
+        'requirements': (order_requirements_button, blanket_and_handkerchiefs_slider,
+                         blanket_and_handkerchiefs_input, ice_cream_counter_plus_button,
+                         ice_cream_counter_plus_value),
+        'booking': (book_taxi_button, car_search_timer, driver_details),
+    }
+
+    # Clock control - when enabled the car search countdown is fast-forwarded
+    virtual_time = False
+    car_search_duration = 60
+
+    # Wait timings - a TimingStore makes waits use learned per-locator deadlines
+    timings = None
+
+    def __init__(self, driver, virtual_time=None):
+        """
+        Initialize the UrbanRoutesPage with a WebDriver instance.
 
-
-    def __init__(self, driver):
-        """Initialize the UrbanRoutesPage with a WebDriver instance."""
+        Args:
+            driver: Selenium WebDriver instance showing the application
+            virtual_time: Install a controllable page clock, defaults to
+                the class-level virtual_time setting
+        """
         self.driver = driver
-        self.wait = WebDriverWait(driver, 5)
+        self.wait = SectionWait(driver, 5, self.sections, self.timings)
+        self.network = NetworkCapture(driver)
+        self.network.install()
+        self._phone_code_capture = None
+        self.clock = None
+        if self.virtual_time if virtual_time is None else virtual_time:
+            self.clock = VirtualClock(driver)
+            self.clock.install()
+
+    # State checks
+    def shows(self, condition, timeout=2):
+        """
+        Check whether a wait condition holds within a short timeout.
+
+        Used to confirm state the page is expected to show already, e.g.
+        after a checkpoint restore, without failing when it does not.
+
+        Args:
+            condition: Condition from pages.conditions
+            timeout: Seconds to wait for the condition
+
+        Returns:
+            True if the condition held in time
+        """
+        try:
+            return bool(self.wait.with_timeout(timeout).until(condition))
+        except TimeoutException:
+            return False
+
+    # Form methods
+    def fill_form(self, values, typed=()):
+        """
+        Set several input fields in a single browser call.
+
+        Fields are filled through the section wait, which dispatches the
+        input, change and blur events the application listens to. Fields
+        listed in typed, and fields whose value the page did not accept,
+        are cleared and typed key by key instead.
+
+        Args:
+            values: Dictionary mapping field locators to their values
+            typed: Locators of fields that must receive real key events
+        """
+        pending = list(typed)
+        bulk = {locator: value for locator, value in values.items() if locator not in pending}
+        if bulk:
+            pending += self.wait.fill(bulk)
+        for locator in pending:
+            field = self.wait.until(EC.element_to_be_clickable(locator))
+            field.clear()
+            field.send_keys(values[locator])
         
     # Route methods
     def set_from(self, from_address):
@@ -103,6 +187,10 @@ class UrbanRoutesPage:
         self.set_from(from_address)
         self.set_to(to_address)
 
+    def fill_route(self, from_address, to_address):
+        """Set both pickup and destination addresses in one browser call, e.g. as a precondition."""
+        self.fill_form({self.from_field: from_address, self.to_field: to_address})
+
     def get_call_taxi_button(self):
         """Wait for and return the 'Call a taxi' button element."""
         return self.wait.until(
@@ -151,8 +239,27 @@ class UrbanRoutesPage:
         )
 
     def click_on_next_button(self):
-        """Click the 'Next' button to proceed to SMS verification."""
-        self.get_next_button().click()
+        """
+        Click the 'Next' button to proceed to SMS verification.
+
+        A capture of the SMS code response is started before the click
+        and stays active until set_sms_code has read the response, so the
+        request is recorded even when the application sends it some time
+        after the click.
+        """
+        if self._phone_code_capture is None:
+            self._phone_code_capture = self.network.start(phone_code_pattern)
+        try:
+            self.get_next_button().click()
+        except Exception:
+            self._stop_phone_code_capture()
+            raise
+
+    def _stop_phone_code_capture(self):
+        """Stop the SMS code capture started by click_on_next_button, if any."""
+        capture_id, self._phone_code_capture = self._phone_code_capture, None
+        if capture_id is not None:
+            self.network.stop(capture_id)
 
     def get_sms_code(self):
         """Wait for and return the SMS code input field element."""
@@ -161,7 +268,11 @@ class UrbanRoutesPage:
         )
     def set_sms_code(self):
         """Retrieve and enter the SMS verification code."""
-        self.get_sms_code().send_keys(retrieve_phone_code(self.driver))
+        try:
+            code = retrieve_phone_code(self.driver, self.network)
+        finally:
+            self._stop_phone_code_capture()
+        self.get_sms_code().send_keys(code)
 
     def get_sms_confirmation_button(self):
         """Wait for and return the SMS confirmation button element."""
@@ -204,14 +315,14 @@ class UrbanRoutesPage:
             EC.visibility_of_element_located(self.card_number_field)
         )
 
-    def set_card_number_field(self):
+    def set_card_number_field(self, card_number=None):
         """
         Enter the card number from test data.
         
-        Card number is retrieved from data.card_number.
+        Card number is retrieved from data.card_number unless one is given.
         """
         card_number_field = self.get_card_number_field()
-        card_number_field.send_keys(data.card_number)
+        card_number_field.send_keys(card_number or data.card_number)
 
     def get_card_code_field(self):
         """Wait for and return the card CVV code input field element."""
@@ -219,11 +330,11 @@ class UrbanRoutesPage:
             EC.element_to_be_clickable(self.card_code_field)
         )
 
-    def set_card_code_field(self):
+    def set_card_code_field(self, card_code=None):
         """
         Enter the card CVV code from test data.
 
-        Card code is retrieved from data.card_code.
+        Card code is retrieved from data.card_code unless one is given.
 
         After entering the CVV, the TAB key is sent to move the
         focus away from the CVV input field. This simulates the
@@ -231,9 +342,20 @@ class UrbanRoutesPage:
         with the "Add" button.
         """
         code_field = self.get_card_code_field()
-        code_field.send_keys(data.card_code)
+        code_field.send_keys(card_code or data.card_code)
         code_field.send_keys(Keys.TAB)
 
+    def set_card(self, card_number=None, card_code=None):
+        """
+        Enter the card number and CVV code in one browser call.
+
+        Values default to data.card_number and data.card_code. The CVV
+        field is blurred after filling, like set_card_code_field does with
+        the TAB key, so the "Add" button becomes available.
+        """
+        self.fill_form({self.card_number_field: card_number or data.card_number,
+                        self.card_code_field: card_code or data.card_code})
+
     def get_add_card_submit_button(self):
         """Wait for and return the 'Add' button to submit the card."""
         return self.wait.until(
@@ -267,14 +389,18 @@ class UrbanRoutesPage:
             EC.visibility_of_element_located(self.comment_for_driver_field)
         )
 
-    def set_comment_for_driver_field(self):
+    def set_comment_for_driver_field(self, message=None):
         """
         Enter a comment for the driver from test data.
         
-        Comment text is retrieved from data.message_for_driver.
+        Comment text is retrieved from data.message_for_driver unless one is given.
         """
         comment_field = self.get_comment_for_driver_field()
-        comment_field.send_keys(data.message_for_driver)
+        comment_field.send_keys(message or data.message_for_driver)
+
+    def fill_comment_for_driver(self, message=None):
+        """Enter a comment for the driver in one browser call, e.g. as a precondition."""
+        self.fill_form({self.comment_for_driver_field: message or data.message_for_driver})
 
     def get_comment_for_driver_value(self):
         """Get the current value of the driver comment field."""
@@ -343,13 +469,16 @@ class UrbanRoutesPage:
         Wait for the search timer to disappear, then return driver details.
         
         This method waits up to 40 seconds for the car search to complete
-        and driver information to appear.
+        and driver information to appear. With virtual time enabled, the
+        page clock is first advanced past the end of the search countdown.
         
         Returns:
             WebElement containing driver details
         """
+        if self.clock:
+            self.clock.advance(self.car_search_duration)
         # Wait for timer to disappear (search complete)
-        WebDriverWait(self.driver, 40).until(
+        self.wait.with_timeout(40).until(
             EC.invisibility_of_element_located(self.car_search_timer)
         )
         # Then wait for and return driver details
@@ -0,0 +1,346 @@
+import json
+import pytest
+from data import data
+from pages.scenarios import Journey, resolve, steps
+from pages.urban_routes_pages import UrbanRoutesPage
+from utilities import scheduler, session_pool, test_impact
+from utilities.browser_profiles import profiles
+from utilities.checkpoints import CheckpointStore
+from utilities.command_profiler import CommandProfiler
+from utilities.instrumentation import instrument
+from utilities.performance_monitor import PerformanceMonitor
+from utilities.replay_server import ReplayServer
+from utilities.step_trace import StepTracer, trace_path
+from utilities.wait_timings import TimingStore
+
+
+def pytest_addoption(parser):
+    """Register the command line options of the Urban Routes suite."""
+    group = parser.getgroup('urban_routes', 'Urban Routes')
+    group.addoption('--pool-size', type=int, default=1,
+                    help='Number of pre-launched browsers kept per worker (default: 1)')
+    group.addoption('--browser-profile', choices=sorted(profiles), default=data.browser_profile,
+                    help='Browser profile to launch: lean, full or debug (default: %(default)s)')
+    group.addoption('--backend', choices=('live', 'record', 'replay'), default=data.backend_mode,
+                    help='Use the live application or record/replay it through a local stand-in')
+    group.addoption('--virtual-time', action='store_true',
+                    help='Fast-forward the car search countdown with a fake page clock')
+    group.addoption('--adaptive-timeouts', action='store_true',
+                    help='Derive wait deadlines per locator from recorded wait times')
+    group.addoption('--checkpoints', action='store_true',
+                    help='Restore journey preconditions from saved browser-state checkpoints')
+    group.addoption('--performance', action='store_true',
+                    help='Collect front-end metrics per page-object step and check data.performance_budgets')
+    group.addoption('--trace-steps', type=int, default=0, metavar='K',
+                    help='Keep snapshots of the last K page-object steps and write them out when a test fails')
+    group.addoption('--profile-commands', action='store_true',
+                    help='Attribute every WebDriver command to its test and page-object method')
+    group.addoption('--record-impact', action='store_true',
+                    help='Record the locators, page-object methods and data each test uses')
+    group.addoption('--changed-since', metavar='REF', default=None,
+                    help='Run only the tests affected by changes since a git ref, reusing cached passes '
+                         '(implies --record-impact)')
+    group.addoption('--shard-count', type=int, default=1,
+                    help='Split the tests into this many duration-balanced shards')
+    group.addoption('--shard-index', type=int, default=None,
+                    help='Run only the shard with this index (0-based)')
+    group.addoption('--shard-plan', metavar='PATH', default=None,
+                    help='Shard plan of a scheduled run: written when collecting without --shard-index, '
+                         'followed by the workers otherwise')
+
+
+def pytest_configure(config):
+    """Register the suite markers, start the backend stand-in and create the browser pool."""
+    config.addinivalue_line('markers', 'scenario(name): test performing the named journey step, '
+                                       'its preconditions are replayed when needed')
+    config.urban_routes_state = config.rootpath / '.urban_routes'
+    config.urban_routes_durations = {}
+    config.urban_routes_backend = None
+    if config.getoption('--backend') != 'live':
+        config.urban_routes_backend = ReplayServer(data.backend_archive, config.getoption('--backend')).start()
+        data.urban_routes_url = config.urban_routes_backend.url + data.urban_routes_path
+    config.urban_routes_checkpoints = None
+    if config.getoption('--checkpoints'):
+        config.urban_routes_checkpoints = CheckpointStore(config.urban_routes_state / 'checkpoints')
+    config.urban_routes_profiler = None
+    profile = config.urban_routes_profile = profiles[config.getoption('--browser-profile')]
+    factory = profile
+    if config.getoption('--profile-commands'):
+        profiler = config.urban_routes_profiler = CommandProfiler()
+
+        def factory():
+            return profiler.attach(profile.launch())
+    session_pool.configure_pool(size=config.getoption('--pool-size'), factory=factory)
+    UrbanRoutesPage.virtual_time = config.getoption('--virtual-time')
+    config.urban_routes_timings = None
+    if config.getoption('--adaptive-timeouts'):
+        config.urban_routes_timings = TimingStore(config.urban_routes_state / 'timings.sqlite',
+                                                  'virtual' if config.getoption('--virtual-time') else 'real')
+    UrbanRoutesPage.timings = config.urban_routes_timings
+    config.urban_routes_monitors = {}
+    config.urban_routes_tracers = {}
+    config.urban_routes_impact = None
+    if config.getoption('--record-impact') or config.getoption('--changed-since'):
+        config.urban_routes_impact = test_impact.DependencyRecorder(config.rootpath, modules=[data])
+    config.urban_routes_impact_entries = {}
+    config.urban_routes_reused = []
+
+
+def _prerequisites(items):
+    """Map each test to the tests performing the journey steps its scenario step requires."""
+    tests = {}
+    for item in items:
+        marker = item.get_closest_marker('scenario')
+        if marker is not None:
+            tests.setdefault(marker.args[0], []).append(item.nodeid)
+    prerequisites = {}
+    for item in items:
+        marker = item.get_closest_marker('scenario')
+        if marker is not None:
+            required = resolve(*steps[marker.args[0]].requires)
+            prerequisites[item.nodeid] = [nodeid for name in required for nodeid in tests.get(name, ())]
+    return prerequisites
+
+
+def _select_changed(config, items):
+    """Keep only the tests affected by the changes since --changed-since."""
+    ref = config.getoption('--changed-since')
+    index = test_impact.load_index(config.urban_routes_state)
+    changed = test_impact.changed_symbols(config.rootpath, test_impact.changed_lines(config.rootpath, ref))
+    run, reused = test_impact.select([item.nodeid for item in items], index, changed, _prerequisites(items))
+    run = set(run)
+    config.urban_routes_reused = reused
+    config.hook.pytest_deselected(items=[item for item in items if item.nodeid not in run])
+    items[:] = [item for item in items if item.nodeid in run]
+
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Keep only the tests affected by --changed-since, then the tests of the selected shard.
+
+    With --shard-plan, the planning run makes both selections once and
+    writes them to the plan, and the workers only read their shard from it.
+    """
+    count = config.getoption('--shard-count')
+    index = config.getoption('--shard-index')
+    plan = config.getoption('--shard-plan')
+    if plan is not None and index is not None:
+        planned = scheduler.load_plan(plan)
+        # The planning run reports nothing, the first worker reports the reused passes
+        config.urban_routes_reused = planned['reused'] if index == 0 else []
+        shard = set(planned['shards'][index])
+    else:
+        if config.getoption('--changed-since'):
+            _select_changed(config, items)
+        if plan is None and (count <= 1 or index is None):
+            return
+        durations = scheduler.load_durations(config.urban_routes_state)
+        shards = scheduler.assign_shards([item.nodeid for item in items], durations, count)
+        if plan is not None:
+            scheduler.save_plan(plan, config.urban_routes_state, shards, config.urban_routes_reused)
+            return
+        shard = set(shards[index])
+    selected = [item for item in items if item.nodeid in shard]
+    config.hook.pytest_deselected(items=[item for item in items if item.nodeid not in shard])
+    items[:] = selected
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item):
+    """Attribute profiled commands and used symbols to the running test."""
+    profiler = item.config.urban_routes_profiler
+    if profiler is not None:
+        profiler.current_test = item.nodeid
+    recorder = item.config.urban_routes_impact
+    if recorder is not None:
+        recorder.start()
+    yield
+    if recorder is not None:
+        symbols = recorder.stop()
+        passed = all(getattr(item, f'rep_{when}', None) is not None and getattr(item, f'rep_{when}').passed
+                     for when in ('setup', 'call'))
+        item.config.urban_routes_impact_entries[item.nodeid] = {
+            'symbols': sorted(symbols), 'outcome': 'passed' if passed else 'failed'}
+    if profiler is not None:
+        profiler.current_test = None
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    """Fail a test whose page-object steps exceeded their performance budgets."""
+    monitor = getattr(item, 'urban_routes_monitor', None)
+    start = len(monitor.violations) if monitor is not None else 0
+    result = yield
+    if monitor is not None and len(monitor.violations) > start:
+        raise AssertionError('performance budgets exceeded:\n' + '\n'.join(monitor.violations[start:]))
+    return result
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Keep the report of each test phase on the item, accumulate durations and write failure traces."""
+    outcome = yield
+    report = outcome.get_result()
+    setattr(item, f'rep_{report.when}', report)
+    tracer = getattr(item, 'urban_routes_tracer', None)
+    if tracer is not None and report.when in ('setup', 'call') and report.failed:
+        path = tracer.flush(trace_path(item.config.urban_routes_state / 'traces', item.nodeid),
+                            report.longreprtext.splitlines()[-1] if report.longreprtext else None)
+        report.sections.append(('step trace', str(path)))
+    if report.when in ('setup', 'call') and report.passed:
+        durations = item.config.urban_routes_durations
+        durations[item.nodeid] = durations.get(item.nodeid, 0.0) + report.duration
+
+
+def _monitor_page(config, page):
+    """Report the page's steps to the performance monitor of its driver, once per page object."""
+    if not config.getoption('--performance') or getattr(page, 'performance', None) is not None:
+        return getattr(page, 'performance', None)
+    monitors = config.urban_routes_monitors
+    if page.driver not in monitors:
+        monitors[page.driver] = PerformanceMonitor(page.driver).install()
+    page.performance = monitors[page.driver]
+    instrument(page, page.performance)
+    return page.performance
+
+
+def _trace_page(config, page):
+    """Report the page's steps to the step tracer of its driver, once per page object."""
+    if not config.getoption('--trace-steps') or getattr(page, 'tracer', None) is not None:
+        return getattr(page, 'tracer', None)
+    tracers = config.urban_routes_tracers
+    if page.driver not in tracers:
+        tracers[page.driver] = StepTracer(page.driver, config.getoption('--trace-steps'))
+    page.tracer = tracers[page.driver]
+    instrument(page, page.tracer)
+    return page.tracer
+
+
+@pytest.fixture(autouse=True)
+def scenario(request):
+    """
+    Bring the class browser to the state required by the test's scenario step.
+
+    The journey left by the previous test is continued when it already
+    satisfies the step's preconditions; otherwise the browser is reset
+    through the session pool and the preconditions are replayed.
+    """
+    marker = request.node.get_closest_marker('scenario')
+    if marker is None or request.cls is None:
+        yield None
+        return
+    name = marker.args[0]
+    cls = request.cls
+    journey = getattr(cls, 'journey', None)
+    if journey is None or journey.page is not cls.routes_page or not journey.can_continue(name):
+        if journey is not None and journey.page is cls.routes_page:
+            session_pool.get_pool().reset(cls.driver)
+            cls.routes_page = UrbanRoutesPage(cls.driver)
+        journey = cls.journey = Journey(cls.routes_page, request.config.urban_routes_checkpoints)
+    request.node.urban_routes_monitor = _monitor_page(request.config, cls.routes_page)
+    tracer = request.node.urban_routes_tracer = _trace_page(request.config, cls.routes_page)
+    if tracer is not None:
+        tracer.current_test = request.node.nodeid
+    journey.prepare(name)
+    yield journey
+    report = getattr(request.node, 'rep_call', None)
+    if report is not None and report.passed:
+        journey.mark(name)
+    else:
+        journey.failed = True
+
+
+def pytest_sessionfinish(session):
+    """Store the measured test durations, wait timings and test dependencies for later runs."""
+    config = session.config
+    if config.urban_routes_impact_entries:
+        test_impact.save_index(config.urban_routes_state, config.urban_routes_impact_entries,
+                               config.getoption('--shard-index'))
+    if config.urban_routes_timings is not None:
+        config.urban_routes_timings.flush()
+    if config.urban_routes_monitors:
+        steps = {}
+        for monitor in config.urban_routes_monitors.values():
+            for step, samples in monitor.samples.items():
+                steps.setdefault(step, []).extend(samples)
+        path = scheduler.shard_path(config.urban_routes_state, 'performance.json',
+                                    config.getoption('--shard-index'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(steps, indent=2))
+    if config.urban_routes_durations:
+        shard_index = config.getoption('--shard-index')
+        durations = dict(config.urban_routes_durations)
+        if shard_index is None:
+            durations = {**scheduler.load_durations(config.urban_routes_state), **durations}
+        # A shard worker keeps only its own measurements, the scheduler merges them
+        scheduler.save_durations(config.urban_routes_state, durations, shard_index)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Report pool statistics, reused results, learned timeouts, traces, command hotspots and archive misses."""
+    stats = session_pool.get_pool().stats()
+    if stats['browsers']:
+        terminalreporter.write_sep('-', 'browser session pool')
+        terminalreporter.write_line(
+            f"browsers: {stats['browsers']}  hits: {stats['hits']}  misses: {stats['misses']}  "
+            f"resets: {stats['resets']}  reset time: {stats['reset_time_total']:.2f}s total, "
+            f"{stats['reset_time_mean']:.2f}s mean, {stats['reset_time_max']:.2f}s max")
+        profile = terminalreporter.config.urban_routes_profile.stats()
+        memory = f"{profile['memory_mb']['mean']:.0f} MB mean RSS" if profile['memory_mb']['count'] else 'RSS n/a'
+        terminalreporter.write_line(
+            f"profile: {profile['profile']}  startup: {profile['startup']['mean']:.2f}s mean, "
+            f"{profile['startup']['max']:.2f}s max  {memory}")
+    reused = terminalreporter.config.urban_routes_reused
+    if terminalreporter.config.getoption('--changed-since'):
+        terminalreporter.write_sep('-', 'change-aware selection')
+        terminalreporter.write_line(f"{len(reused)} tests unaffected since "
+                                    f"{terminalreporter.config.getoption('--changed-since')}, cached passes reused:")
+        for nodeid in reused:
+            terminalreporter.write_line(f'  {nodeid}')
+    timings = terminalreporter.config.urban_routes_timings
+    if timings is not None and timings.learned():
+        terminalreporter.write_sep('-', 'adaptive wait timeouts')
+        for key, timeout in timings.learned().items():
+            terminalreporter.write_line(f'{timeout:6.2f}s  {key}')
+    monitors = terminalreporter.config.urban_routes_monitors
+    if monitors:
+        violations = [violation for monitor in monitors.values() for violation in monitor.violations]
+        path = scheduler.shard_path(terminalreporter.config.urban_routes_state, 'performance.json',
+                                    terminalreporter.config.getoption('--shard-index'))
+        terminalreporter.write_sep('-', 'front-end performance budgets')
+        terminalreporter.write_line(f'{len(violations)} budget violations, per-step metrics written to {path}')
+        for violation in violations:
+            terminalreporter.write_line(f'  {violation}')
+    tracers = terminalreporter.config.urban_routes_tracers
+    if tracers:
+        captures = sum(tracer.captures for tracer in tracers.values())
+        capture_time = sum(tracer.capture_time for tracer in tracers.values())
+        terminalreporter.write_sep('-', 'step traces')
+        terminalreporter.write_line(
+            f"{captures} step snapshots, {capture_time / captures if captures else 0.0:.3f}s mean on the test "
+            f"thread; failure traces in {terminalreporter.config.urban_routes_state / 'traces'}")
+    profiler = terminalreporter.config.urban_routes_profiler
+    if profiler is not None and profiler.stats:
+        terminalreporter.write_sep('-', 'webdriver command hotspots')
+        for line in profiler.report():
+            terminalreporter.write_line(line)
+        path = scheduler.shard_path(terminalreporter.config.urban_routes_state, 'commands.json',
+                                    terminalreporter.config.getoption('--shard-index'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(profiler.to_json(), indent=2))
+        terminalreporter.write_line(f'per-test command statistics written to {path}')
+    backend = terminalreporter.config.urban_routes_backend
+    if backend is not None and backend.misses:
+        terminalreporter.write_sep('-', 'backend stand-in')
+        terminalreporter.write_line(f'{len(backend.misses)} requests not found in {backend.archive.directory}:')
+        for key in sorted(set(backend.misses)):
+            terminalreporter.write_line(f'  {key}')
+
+
+def pytest_unconfigure(config):
+    """Stop the trace encoders, quit every pooled browser and stop the backend stand-in."""
+    for tracer in getattr(config, 'urban_routes_tracers', {}).values():
+        tracer.close()
+    session_pool.get_pool().close()
+    if getattr(config, 'urban_routes_backend', None) is not None:
+        config.urban_routes_backend.stop()
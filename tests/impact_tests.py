@@ -0,0 +1,152 @@
+import subprocess
+import textwrap
+from utilities import test_impact
+
+
+def git(root, *args):
+    """Run a git command in a test repository."""
+    subprocess.run(['git', *args], cwd=root, check=True, capture_output=True)
+
+
+def write(root, path, source):
+    """Write a dedented source file into a test repository."""
+    target = root / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(textwrap.dedent(source))
+
+
+PAGE = """
+    class Page:
+        from_field = ('id', 'from')
+        to_field = ('id', 'to')
+
+        def set_from(self, value):
+            return self.from_field, value
+
+        def set_to(self, value):
+            return self.to_field, value
+
+
+    X = 1
+
+    try:
+        def guarded():
+            return X
+    except ImportError:
+        pass
+"""
+
+
+class TestChangedLines:
+    """Mapping a git diff to the changed lines of each file."""
+
+    def commit(self, tmp_path):
+        """Create a repository with one committed page module."""
+        git(tmp_path, 'init', '-q')
+        git(tmp_path, 'config', 'user.email', 'tests@example.com')
+        git(tmp_path, 'config', 'user.name', 'tests')
+        write(tmp_path, 'pages/page.py', PAGE)
+        write(tmp_path, 'README.md', 'Page\n')
+        git(tmp_path, 'add', '.')
+        git(tmp_path, 'commit', '-q', '-m', 'baseline')
+
+    def test_modified_lines_of_working_tree(self, tmp_path):
+        self.commit(tmp_path)
+        source = (tmp_path / 'pages/page.py').read_text().replace("'to')", "'destination')")
+        (tmp_path / 'pages/page.py').write_text(source)
+        lines = source.splitlines()
+        changed = test_impact.changed_lines(tmp_path, 'HEAD')
+        assert changed == {'pages/page.py': {lines.index("    to_field = ('id', 'destination')") + 1}}
+
+    def test_deleted_lines_and_files(self, tmp_path):
+        self.commit(tmp_path)
+        source = (tmp_path / 'pages/page.py').read_text()
+        (tmp_path / 'pages/page.py').write_text(source.replace("        return self.to_field, value\n", ''))
+        (tmp_path / 'README.md').unlink()
+        changed = test_impact.changed_lines(tmp_path, 'HEAD')
+        assert set(changed) == {'pages/page.py', 'README.md'}
+        assert len(changed['pages/page.py']) == 1
+        assert changed['README.md'] == set()
+
+    def test_untracked_files_are_new(self, tmp_path):
+        self.commit(tmp_path)
+        write(tmp_path, 'pages/extra.py', '''
+            def extra():
+                return 1
+        ''')
+        write(tmp_path, 'recordings/body.json', '{}')
+        write(tmp_path, '.gitignore', 'ignored.txt\n')
+        write(tmp_path, 'ignored.txt', 'scratch')
+        changed = test_impact.changed_lines(tmp_path, 'HEAD')
+        assert changed == {'pages/extra.py': {1, 2, 3, 4}, 'recordings/body.json': {1}, '.gitignore': {1, 2}}
+        assert test_impact.changed_symbols(tmp_path, changed) >= {'pages/extra.py::extra', 'recordings/body.json'}
+
+
+class TestChangedSymbols:
+    """Mapping changed lines to functions, attributes and names."""
+
+    def symbols(self, tmp_path, changed):
+        write(tmp_path, 'pages/page.py', PAGE)
+        lines = (tmp_path / 'pages/page.py').read_text().splitlines()
+        numbers = {lines.index(line) + 1 for line in changed}
+        return test_impact.changed_symbols(tmp_path, {'pages/page.py': numbers})
+
+    def test_method_body(self, tmp_path):
+        assert self.symbols(tmp_path, ['        return self.from_field, value']) == {
+            'pages/page.py::Page.set_from'}
+
+    def test_locator_selects_methods_using_it(self, tmp_path):
+        assert self.symbols(tmp_path, ["    to_field = ('id', 'to')"]) == {
+            'pages/page.py::Page.to_field', 'pages/page.py::Page.set_to'}
+
+    def test_function_inside_try_block(self, tmp_path):
+        assert self.symbols(tmp_path, ['X = 1']) == {'pages/page.py::X', 'pages/page.py::guarded'}
+        assert self.symbols(tmp_path, ['        return X']) == {'pages/page.py::guarded'}
+
+    def test_module_level_statement(self, tmp_path):
+        assert self.symbols(tmp_path, ['    pass']) == {'pages/page.py'}
+
+    def test_other_and_deleted_files(self, tmp_path):
+        changed = {'recordings/urban_routes/index.json': {1}, 'pages/removed.py': set()}
+        assert test_impact.changed_symbols(tmp_path, changed) == set(changed)
+
+
+class TestSelect:
+    """Splitting tests into the ones to run and the reused passes."""
+
+    nodeids = ['t::route', 't::fare', 't::phone']
+    index = {
+        't::route': {'symbols': ['pages/page.py::Page.set_from', 'data/data.py::address_from'],
+                     'outcome': 'passed'},
+        't::fare': {'symbols': ['pages/page.py::Page.click_fare'], 'outcome': 'passed'},
+        't::phone': {'symbols': ['pages/page.py::Page.set_phone', 'recordings/bodies/code.json'],
+                     'outcome': 'passed'},
+    }
+    prerequisites = {'t::fare': ['t::route'], 't::phone': ['t::route', 't::fare']}
+
+    def select(self, symbols, index=None):
+        return test_impact.select(self.nodeids, self.index if index is None else index, set(symbols),
+                                  self.prerequisites)
+
+    def test_unaffected_tests_reuse_their_pass(self):
+        assert self.select({'pages/page.py::Page.click_fare'}) == (['t::route', 't::fare'], ['t::phone'])
+
+    def test_data_attribute(self):
+        assert self.select({'data/data.py::address_from'}) == (['t::route'], ['t::fare', 't::phone'])
+
+    def test_file_change_selects_tests_using_the_file(self):
+        assert self.select({'recordings/bodies/code.json'}) == (self.nodeids, [])
+        assert self.select({'pages/page.py'}) == (self.nodeids, [])
+
+    def test_missing_or_failed_tests_run(self):
+        index = dict(self.index, **{'t::fare': {'symbols': [], 'outcome': 'failed'}})
+        del index['t::phone']
+        assert self.select(set(), index) == (self.nodeids, [])
+
+    def test_unattributed_changes_select_everything(self):
+        assert self.select({'requirements.txt'}) == (self.nodeids, [])
+        assert self.select({'tests/conftest.py::pytest_configure'}) == (self.nodeids, [])
+        assert self.select({'recordings/index.json'}) == (self.nodeids, [])
+
+    def test_documentation_selects_nothing(self):
+        assert self.select({'README.md'}) == ([], self.nodeids)
@@ -0,0 +1,99 @@
+import json
+import os
+from utilities import scheduler, test_impact
+
+
+def write_json(path, content, mtime):
+    """Write a JSON file with a given modification time."""
+    path.write_text(json.dumps(content))
+    os.utime(path, (mtime, mtime))
+
+
+class TestAssignShards:
+    """Splitting tests into duration-balanced shards."""
+
+    def test_longest_tests_first_onto_the_lightest_shard(self):
+        durations = {'t::a': 10.0, 't::b': 6.0, 't::c': 5.0, 't::d': 4.0, 't::e': 1.0}
+        shards = scheduler.assign_shards(list(durations), durations, 2)
+        assert shards == [['t::a', 't::d'], ['t::b', 't::c', 't::e']]
+
+    def test_every_test_in_exactly_one_shard(self):
+        nodeids = [f't::{index}' for index in range(7)]
+        shards = scheduler.assign_shards(nodeids, {}, 3)
+        assert sorted(nodeid for shard in shards for nodeid in shard) == sorted(nodeids)
+        assert [len(shard) for shard in shards] == [3, 2, 2]
+
+    def test_unknown_tests_take_the_mean_duration(self):
+        durations = {'t::a': 2.0, 't::b': 4.0}
+        shards = scheduler.assign_shards(['t::a', 't::b', 't::new'], durations, 2)
+        assert shards == [['t::b'], ['t::new', 't::a']]
+
+    def test_more_shards_than_tests(self):
+        assert scheduler.assign_shards(['t::a'], {}, 3) == [['t::a'], [], []]
+
+
+class TestLoadDurations:
+    """Merging the durations files written by the workers."""
+
+    def test_missing_directory(self, tmp_path):
+        assert scheduler.load_durations(tmp_path / 'missing') == {}
+
+    def test_newest_file_takes_precedence(self, tmp_path):
+        write_json(tmp_path / 'durations.json', {'t::a': 1.0, 't::b': 2.0}, 1000)
+        write_json(tmp_path / 'durations-1.json', {'t::b': 3.0}, 3000)
+        write_json(tmp_path / 'durations-0.json', {'t::a': 4.0, 't::c': 5.0}, 2000)
+        assert scheduler.load_durations(tmp_path) == {'t::a': 4.0, 't::b': 3.0, 't::c': 5.0}
+
+    def test_unreadable_files_are_skipped(self, tmp_path):
+        write_json(tmp_path / 'durations.json', {'t::a': 1.0}, 1000)
+        (tmp_path / 'durations-0.json').write_text('{')
+        assert scheduler.load_durations(tmp_path) == {'t::a': 1.0}
+
+    def test_saved_shard_durations_are_loaded(self, tmp_path):
+        scheduler.save_durations(tmp_path, {'t::a': 1.5}, shard_index=2)
+        assert (tmp_path / 'durations-2.json').exists()
+        assert scheduler.load_durations(tmp_path) == {'t::a': 1.5}
+
+
+class TestMergeShards:
+    """Combining the reports the shard workers wrote to their own files."""
+
+    def test_reports_are_merged_and_shard_files_removed(self, tmp_path):
+        write_json(scheduler.shard_path(tmp_path, 'performance.json', 0), {'set_route': [{'long_tasks': 1}]}, 1000)
+        write_json(scheduler.shard_path(tmp_path, 'performance.json', 1),
+                   {'set_route': [{'long_tasks': 2}], 'order_taxi': [{'long_tasks': 0}]}, 1000)
+        write_json(scheduler.shard_path(tmp_path, 'commands.json', 1), [{'test': 't::b'}], 1000)
+        scheduler.merge_shards(tmp_path, 2)
+        assert json.loads((tmp_path / 'performance.json').read_text()) == {
+            'set_route': [{'long_tasks': 1}, {'long_tasks': 2}], 'order_taxi': [{'long_tasks': 0}]}
+        assert json.loads((tmp_path / 'commands.json').read_text()) == [{'test': 't::b'}]
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['commands.json', 'performance.json']
+
+    def test_shard_index_entries_merge_into_the_index(self, tmp_path):
+        test_impact.save_index(tmp_path, {'t::a': {'symbols': [], 'outcome': 'failed'}})
+        test_impact.save_index(tmp_path, {'t::a': {'symbols': [], 'outcome': 'passed'}}, shard_index=0)
+        test_impact.save_index(tmp_path, {'t::b': {'symbols': [], 'outcome': 'passed'}}, shard_index=1)
+        assert test_impact.load_index(tmp_path) == {'t::a': {'symbols': [], 'outcome': 'passed'},
+                                                    't::b': {'symbols': [], 'outcome': 'passed'}}
+        scheduler.merge_shards(tmp_path, 2)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['impact.json']
+        assert test_impact.load_index(tmp_path) == {'t::a': {'symbols': [], 'outcome': 'passed'},
+                                                    't::b': {'symbols': [], 'outcome': 'passed'}}
+
+    def test_measured_durations_update_the_stored_ones(self, tmp_path):
+        scheduler.save_durations(tmp_path, {'t::a': 1.0, 't::b': 2.0, 't::c': 3.0})
+        scheduler.save_durations(tmp_path, {'t::a': 4.0}, shard_index=0)
+        scheduler.save_durations(tmp_path, {'t::b': 5.0}, shard_index=1)
+        scheduler.merge_shards(tmp_path, 2)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['durations.json']
+        assert scheduler.load_durations(tmp_path) == {'t::a': 4.0, 't::b': 5.0, 't::c': 3.0}
+
+
+class TestPlan:
+    """The shard plan a scheduled run hands to its workers."""
+
+    def test_round_trip(self, tmp_path):
+        shards = scheduler.assign_shards(['t::a', 't::b', 't::c'], {'t::a': 3.0}, 2)
+        scheduler.save_plan(tmp_path / 'shards.json', tmp_path / 'state', shards, ['t::d'])
+        assert scheduler.load_plan(tmp_path / 'shards.json') == {
+            'state': str(tmp_path / 'state'), 'shards': shards, 'reused': ['t::d']}
@@ -1,8 +1,7 @@
+import pytest
 from data import data
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from pages.urban_routes_pages import UrbanRoutesPage
-from selenium import webdriver
+from utilities.session_pool import get_pool
 
 
 class TestUrbanRoutes:
@@ -13,7 +12,9 @@ class TestUrbanRoutes:
     user flow for booking a taxi, including route selection, fare choice,
     payment setup, preferences, and booking confirmation.
     
-    Tests are executed sequentially as they represent a single user journey.
+    Each test is marked with the journey step it performs. When run in
+    order the tests continue a single user journey; when run alone or in
+    a shard, the step's preconditions are replayed first.
     """
 
     driver = None
@@ -23,17 +24,15 @@ class TestUrbanRoutes:
         """
         Set up the test environment before running tests.
         
-        Initializes Chrome WebDriver with performance logging enabled,
-        navigates to the Urban Routes URL, and creates a page object instance.
-        This runs once before all tests in the class.
-        """
-        options = Options()
-        options.set_capability("goog:loggingPrefs", {"performance":"ALL"})
-        cls.driver = webdriver.Chrome(service=Service(),options=options)
-        cls.driver.get(data.urban_routes_url)
+        Checks out a pre-launched Chrome WebDriver from the session pool,
+        already showing a fresh Urban Routes page, and creates a page
+        object instance. This runs once before all tests in the class.
+        """
+        cls.driver = get_pool().checkout()
         cls.routes_page = UrbanRoutesPage(cls.driver)
 
 
+    @pytest.mark.scenario('route')
     def test_set_route(self):
         """
         Test that user can set pickup and drop-off addresses.
@@ -48,6 +47,7 @@ class TestUrbanRoutes:
         assert self.routes_page.get_from() == address_from
         assert self.routes_page.get_to() == address_to
 
+    @pytest.mark.scenario('comfort_fare')
     def test_comfort_fare(self):
         """
         Test that user can select the Comfort fare option.
@@ -62,6 +62,7 @@ class TestUrbanRoutes:
         comfort_text = "Comfort"
         assert comfort_fare.text == comfort_text
 
+    @pytest.mark.scenario('phone')
     def test_add_phone_number(self):
         """
         Test that user can add and verify a phone number.
@@ -78,6 +79,7 @@ class TestUrbanRoutes:
         self.routes_page.click_on_confirmation_button()
         assert self.routes_page.get_phone_number_after_confirmation() == data.phone_number
 
+    @pytest.mark.scenario('card')
     def test_add_credit_card(self):
         """
         Test that user can add a credit card as payment method.
@@ -95,6 +97,7 @@ class TestUrbanRoutes:
         assert self.routes_page.get_new_card_added().is_displayed()
         self.routes_page.click_on_payment_method_close_button()
 
+    @pytest.mark.scenario('comment')
     def test_comment_for_driver(self):
         """
         Test that user can add a comment for the driver.
@@ -106,6 +109,7 @@ class TestUrbanRoutes:
         self.routes_page.set_comment_for_driver_field()
         assert self.routes_page.get_comment_for_driver_value() == data.message_for_driver
 
+    @pytest.mark.scenario('blanket_and_handkerchiefs')
     def test_add_blanket_and_handkerchiefs(self):
         """
         Test that user can enable the blanket and handkerchiefs option.
@@ -118,6 +122,7 @@ class TestUrbanRoutes:
         self.routes_page.click_on_blanket_and_handkerchiefs_slider()
         assert self.routes_page.get_blanket_slider_input().is_selected()
 
+    @pytest.mark.scenario('ice_cream')
     def test_add_ice_cream(self):
         """
         Test that user can add ice cream to the order.
@@ -130,6 +135,7 @@ class TestUrbanRoutes:
         self.routes_page.click_on_ice_cream_counter_plus_button()
         assert self.routes_page.get_ice_cream_counter_plus_value().text == '2'
 
+    @pytest.mark.scenario('booking')
     def test_car_search_modal(self):
         """
         Test that taxi search modal appears when booking.
@@ -141,6 +147,7 @@ class TestUrbanRoutes:
         self.routes_page.click_on_book_taxi_button()
         assert self.routes_page.get_car_search_timer().is_displayed()
 
+    @pytest.mark.scenario('driver_info')
     def test_driver_info_appears(self):
         """
         Test that driver information appears after search completes.
@@ -155,4 +162,5 @@ class TestUrbanRoutes:
 
     @classmethod
     def teardown_class(cls):
-        cls.driver.quit()
+        """Return the browser to the session pool for the next test class."""
+        get_pool().checkin(cls.driver)
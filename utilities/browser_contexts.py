@@ -0,0 +1,114 @@
+"""
+Isolated booking journeys in browser contexts of a single Chrome.
+
+A browser context is Chrome's incognito-like partition: it has its own
+cookies, storage and cache but shares the browser process, so creating
+one costs a few milliseconds and a renderer instead of a whole browser.
+BrowserContextPool opens a context with one page per journey, drives it
+with an AsyncUrbanRoutesPage over the browser's DevTools websocket, and
+run_journeys schedules journeys onto a bounded number of concurrent
+contexts.
+"""
+import asyncio
+import time
+from data import data
+from pages.async_urban_routes_pages import AsyncUrbanRoutesPage
+from utilities.cdp_client import connect_browser
+
+
+class BrowserContextPool:
+    """Creates and disposes isolated browser contexts in one browser."""
+
+    def __init__(self, connection, url=None, timeout=5):
+        """
+        Initialize the pool.
+
+        Args:
+            connection: Browser-level CDPConnection
+            url: Application URL, defaults to data.urban_routes_url
+            timeout: Seconds the pages wait for an element
+        """
+        self.connection = connection
+        self.url = url or data.urban_routes_url
+        self.timeout = timeout
+        self.startup_times = []
+        self._contexts = {}
+
+    @classmethod
+    async def attach(cls, driver, url=None, timeout=5, endpoint=None):
+        """Connect to the browser of a Chrome WebDriver session, see AsyncUrbanRoutesPage.attach for the endpoint."""
+        return cls(await connect_browser(driver, endpoint or data.cdp_endpoint), url, timeout)
+
+    async def open(self):
+        """
+        Create a context with a page showing the application.
+
+        Returns:
+            AsyncUrbanRoutesPage driving the new context's page
+        """
+        start = time.perf_counter()
+        context = await self.connection.send('Target.createBrowserContext', {'disposeOnDetach': True})
+        context_id = context['browserContextId']
+        target = await self.connection.send('Target.createTarget', {
+            'url': 'about:blank', 'browserContextId': context_id})
+        attached = await self.connection.send('Target.attachToTarget', {
+            'targetId': target['targetId'], 'flatten': True})
+        page = AsyncUrbanRoutesPage(self.connection.session(attached['sessionId']), self.timeout)
+        self._contexts[page] = context_id
+        self.startup_times.append(time.perf_counter() - start)
+        try:
+            await page.open(self.url)
+        except Exception:
+            await self.dispose(page)
+            raise
+        return page
+
+    async def dispose(self, page):
+        """Close a page's context together with its cookies and storage."""
+        context_id = self._contexts.pop(page)
+        await self.connection.send('Target.disposeBrowserContext', {'browserContextId': context_id})
+
+    async def close(self):
+        """Dispose every open context and close the browser connection."""
+        for page in list(self._contexts):
+            await self.dispose(page)
+        await self.connection.close()
+
+
+async def run_journeys(pool, bookings, concurrency, on_journey=None):
+    """
+    Run one booking journey per booking, each in a fresh context.
+
+    At most concurrency journeys are in flight; a new context is opened
+    as soon as a running journey finishes.
+
+    Args:
+        pool: BrowserContextPool to open contexts from
+        bookings: Iterable of booking records, consumed lazily
+        concurrency: Maximum number of contexts open at the same time
+        on_journey: Optional callable receiving (booking, seconds, error)
+            after every journey, error being None on success
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def journey(booking):
+        start = time.perf_counter()
+        error = None
+        try:
+            page = await pool.open()
+            try:
+                await page.run_journey(booking)
+            finally:
+                await pool.dispose(page)
+        except Exception as failure:
+            error = failure
+        finally:
+            semaphore.release()
+        if on_journey is not None:
+            on_journey(booking, time.perf_counter() - start, error)
+
+    tasks = []
+    for booking in bookings:
+        await semaphore.acquire()
+        tasks.append(asyncio.ensure_future(journey(booking)))
+    await asyncio.gather(*tasks)
@@ -0,0 +1,202 @@
+"""
+Named Chrome configurations for tests, pools and benchmarks.
+
+A profile bundles the Chrome command line, the chromedriver service
+settings and the URL patterns blocked at the network layer. Profiles
+are callables returning a new WebDriver, so one can be handed to the
+session pool as its factory, and each profile records the startup time
+of the browsers it launched. Their resident memory is sampled with
+record_memory() once the application has been used, e.g. when the
+session pool gets a browser back, because a browser on about:blank
+right after launch says little about the memory the suite needs:
+
+    lean   headless, background services off, images, fonts and
+           third-party trackers blocked
+    full   Chrome defaults, as the suite has always run
+    debug  visible window with DevTools open and verbose logs
+"""
+import os
+import time
+import weakref
+from pathlib import Path
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from utilities.stats import summarize
+
+_BACKGROUND_SERVICES = (
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-domain-reliability',
+    '--disable-sync',
+    '--disable-client-side-phishing-detection',
+    '--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication',
+    '--metrics-recording-only',
+    '--no-first-run',
+    '--no-default-browser-check',
+)
+
+# Profile that launched each live driver
+_launched_by = weakref.WeakKeyDictionary()
+
+
+def resident_memory(driver):
+    """
+    Return the resident memory of the browser started by a driver.
+
+    The resident set sizes of every process below chromedriver (the
+    browser, its renderers, GPU and utility processes) are summed, so
+    shared pages are counted once per process.
+
+    Args:
+        driver: Chrome WebDriver instance
+
+    Returns:
+        Resident memory in bytes, or None where /proc is not available
+    """
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    proc = Path('/proc')
+    if process is None or not proc.is_dir():
+        return None
+    children = {}
+    for stat in proc.glob('[0-9]*/stat'):
+        try:
+            # The command name may contain spaces, the fields after it do not
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    total = 0
+    pending = list(children.get(process.pid, []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            status = (proc / str(pid) / 'status').read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith('VmRSS:'):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def record_memory(driver):
+    """
+    Record the resident memory of a browser on the profile that launched it.
+
+    Args:
+        driver: Chrome WebDriver instance, ignored if no profile launched it
+    """
+    profile = _launched_by.get(driver)
+    memory = resident_memory(driver) if profile is not None else None
+    if memory is not None:
+        profile.memory.append(memory)
+
+
+class BrowserProfile:
+    """A named Chrome configuration that launches WebDriver sessions."""
+
+    def __init__(self, name, arguments=(), headless=False, blocked_urls=(), log_file=None,
+                 capabilities=None):
+        """
+        Initialize the profile.
+
+        Args:
+            name: Profile name used on the command line
+            arguments: Chrome command line switches
+            headless: Run Chrome without a window
+            blocked_urls: URL patterns (with * wildcards) the browser must not load
+            log_file: Write a verbose chromedriver log to this file
+            capabilities: Extra capabilities set on the options
+        """
+        self.name = name
+        self.arguments = tuple(arguments)
+        self.headless = headless
+        self.blocked_urls = list(blocked_urls)
+        self.log_file = log_file
+        self.capabilities = capabilities or {}
+        self.startup_times = []
+        self.memory = []
+
+    def __repr__(self):
+        return f'BrowserProfile({self.name!r})'
+
+    def options(self):
+        """Return the Chrome options of the profile."""
+        options = Options()
+        if self.headless:
+            options.add_argument('--headless=new')
+        for argument in self.arguments:
+            options.add_argument(argument)
+        for name, value in self.capabilities.items():
+            options.set_capability(name, value)
+        return options
+
+    def service(self):
+        """Return the chromedriver service of the profile."""
+        if self.log_file is None:
+            return Service()
+        Path(self.log_file).parent.mkdir(parents=True, exist_ok=True)
+        return Service(log_output=str(self.log_file), service_args=['--verbose'])
+
+    def launch(self):
+        """
+        Launch a Chrome WebDriver with this profile.
+
+        Blocked URL patterns are installed through CDP before the driver
+        is returned. The startup time is recorded on the profile.
+
+        Returns:
+            WebDriver instance
+        """
+        start = time.perf_counter()
+        driver = webdriver.Chrome(service=self.service(), options=self.options())
+        if self.blocked_urls:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_urls})
+        self.startup_times.append(time.perf_counter() - start)
+        _launched_by[driver] = self
+        return driver
+
+    __call__ = launch
+
+    def stats(self):
+        """Return startup time and resident memory statistics of the launched browsers."""
+        return {
+            'profile': self.name,
+            'browsers': len(self.startup_times),
+            'startup': summarize(self.startup_times),
+            'memory_mb': summarize([memory / 2 ** 20 for memory in self.memory]),
+        }
+
+
+profiles = {
+    'lean': BrowserProfile(
+        'lean',
+        arguments=_BACKGROUND_SERVICES + (
+            '--window-size=1920,1080',
+            '--disable-gpu',
+            '--disable-extensions',
+            '--disable-notifications',
+            '--mute-audio',
+            '--blink-settings=imagesEnabled=false',
+        ),
+        headless=True,
+        blocked_urls=(
+            '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.ico',
+            '*.woff', '*.woff2', '*.ttf', '*.otf',
+            '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+            '*mc.yandex.ru*', '*facebook.net*', '*hotjar.com*',
+        ),
+    ),
+    'full': BrowserProfile('full'),
+    'debug': BrowserProfile(
+        'debug',
+        arguments=('--auto-open-devtools-for-tabs', '--enable-logging=stderr', '--v=1'),
+        log_file=os.path.join('.urban_routes', 'chromedriver.log'),
+        capabilities={'goog:loggingPrefs': {'browser': 'ALL', 'performance': 'ALL'}},
+    ),
+}
@@ -0,0 +1,248 @@
+"""
+Minimal asyncio client for the Chrome DevTools Protocol.
+
+Commands are sent over the browser's websocket without waiting for the
+previous one to complete, so independent commands are pipelined and
+their round trips overlap. Only the standard library is used: the
+websocket handshake and framing needed for CDP are implemented here.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import os
+import struct
+import urllib.request
+from urllib.parse import urlsplit
+
+
+class CDPError(Exception):
+    """Raised when a CDP command fails or the connection is closed."""
+
+
+class CDPConnection:
+    """A websocket connection to a CDP endpoint (browser or page target)."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = {}
+        self._send_lock = asyncio.Lock()
+        self._error = None
+        self._receiver = asyncio.ensure_future(self._receive())
+
+    @classmethod
+    async def connect(cls, ws_url):
+        """
+        Open a connection to a CDP websocket URL.
+
+        Args:
+            ws_url: webSocketDebuggerUrl of a browser or target
+
+        Returns:
+            Connected CDPConnection
+
+        Raises:
+            CDPError: If the websocket handshake fails
+        """
+        parts = urlsplit(ws_url)
+        secure = parts.scheme == 'wss'
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or (443 if secure else 80),
+                                                       ssl=secure or None)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\n'
+                      f'Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n'
+                      f'Sec-WebSocket-Version: 13\r\n\r\n').encode())
+        await writer.drain()
+        response = await reader.readuntil(b'\r\n\r\n')
+        if b' 101 ' not in response.split(b'\r\n', 1)[0]:
+            writer.close()
+            raise CDPError(f'Websocket handshake with {ws_url} failed: {response.splitlines()[0]!r}')
+        return cls(reader, writer)
+
+    async def send(self, method, params=None, session_id=None):
+        """
+        Send a command and wait for its result.
+
+        Several send() calls can be awaited concurrently, their commands
+        are all written before any response is awaited.
+
+        Args:
+            method: CDP method, e.g. 'Runtime.evaluate'
+            params: Command parameters
+            session_id: Target session for flattened browser connections
+
+        Returns:
+            The command's result dictionary
+
+        Raises:
+            CDPError: If the browser reports an error or the connection is lost
+        """
+        if self._error is not None:
+            raise CDPError(f'Connection lost: {self._error}')
+        message = {'id': next(self._ids), 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message['id']] = future
+        await self._write_frame(json.dumps(message).encode())
+        return await future
+
+    def on(self, event, callback, session_id=None):
+        """Call callback(params) for every occurrence of a CDP event (of one target session)."""
+        self._listeners.setdefault((event, session_id), []).append(callback)
+
+    def session(self, session_id):
+        """Return a connection-like view of one attached target session."""
+        return CDPSession(self, session_id)
+
+    async def close(self):
+        """Close the connection."""
+        self._receiver.cancel()
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    async def _write_frame(self, payload, opcode=0x1):
+        """Write one masked client frame."""
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        mask = os.urandom(4)
+        key = (mask * (length // 4 + 1))[:length]
+        masked = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+        async with self._send_lock:
+            self._writer.write(header + mask + masked)
+            await self._writer.drain()
+
+    async def _read_message(self):
+        """Read one complete (possibly fragmented) data message."""
+        chunks = []
+        while True:
+            first, second = await self._reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await self._reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await self._reader.readexactly(8))[0]
+            payload = await self._reader.readexactly(length)
+            if opcode == 0x8:
+                raise CDPError('Connection closed by the browser')
+            if opcode == 0x9:
+                await self._write_frame(payload, opcode=0xA)
+                continue
+            if opcode == 0xA:
+                continue
+            chunks.append(payload)
+            if first & 0x80:
+                return b''.join(chunks)
+
+    async def _receive(self):
+        """Dispatch responses to their pending commands and events to listeners."""
+        try:
+            while True:
+                message = json.loads(await self._read_message())
+                if 'id' in message:
+                    future = self._pending.pop(message['id'], None)
+                    if future is None or future.done():
+                        continue
+                    if 'error' in message:
+                        future.set_exception(CDPError(message['error'].get('message', message['error'])))
+                    else:
+                        future.set_result(message.get('result', {}))
+                else:
+                    for callback in self._listeners.get((message.get('method'), message.get('sessionId')), []):
+                        callback(message.get('params', {}))
+        except Exception as error:
+            # E.g. a closed socket, an undecodable message or a failing event callback:
+            # nothing would resolve the pending commands any more
+            self._error = error
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CDPError(f'Connection lost: {error}'))
+            self._pending.clear()
+
+
+class CDPSession:
+    """
+    A target session multiplexed over a browser-level connection.
+
+    Offers the send/on/close interface of CDPConnection, so page objects
+    can drive a target attached with Target.attachToTarget(flatten=True).
+    """
+
+    def __init__(self, connection, session_id):
+        self.connection = connection
+        self.session_id = session_id
+
+    async def send(self, method, params=None):
+        """Send a command to the session's target and wait for its result."""
+        return await self.connection.send(method, params, self.session_id)
+
+    def on(self, event, callback):
+        """Call callback(params) for every occurrence of an event of this target."""
+        self.connection.on(event, callback, self.session_id)
+
+    async def close(self):
+        """Detach from the target, leaving the browser connection open."""
+        await self.connection.send('Target.detachFromTarget', {'sessionId': self.session_id})
+
+
+def browser_websocket_url(address):
+    """Return the browser-level websocket URL of a DevTools HTTP endpoint (host:port)."""
+    with urllib.request.urlopen(f'http://{address}/json/version', timeout=10) as response:
+        return json.load(response)['webSocketDebuggerUrl']
+
+
+def devtools_endpoints(driver, endpoint=None):
+    """
+    Return the candidate DevTools endpoints of a WebDriver session, most specific first.
+
+    Args:
+        driver: Chrome WebDriver instance
+        endpoint: Configured endpoint, a websocket URL or host:port
+
+    Returns:
+        List of websocket URLs and host:port addresses: the configured
+        endpoint, the se:cdp capability Selenium Grid sets for remote
+        sessions, and the debuggerAddress of a local Chrome
+    """
+    capabilities = driver.capabilities
+    candidates = [endpoint, capabilities.get('se:cdp'),
+                  capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')]
+    return [candidate for candidate in candidates if candidate]
+
+
+async def connect_browser(driver, endpoint=None):
+    """
+    Open a browser-level connection to the Chrome of a WebDriver session.
+
+    Args:
+        driver: Chrome WebDriver instance, local or remote
+        endpoint: Configured endpoint tried first, see devtools_endpoints()
+
+    Returns:
+        Connected CDPConnection
+
+    Raises:
+        CDPError: If no candidate endpoint can be reached
+    """
+    failures = []
+    for candidate in devtools_endpoints(driver, endpoint):
+        try:
+            ws_url = candidate if candidate.startswith(('ws://', 'wss://')) else browser_websocket_url(candidate)
+            return await CDPConnection.connect(ws_url)
+        except (OSError, EOFError, ValueError, KeyError, CDPError) as error:
+            failures.append(f'{candidate}: {error}')
+    raise CDPError('No reachable DevTools endpoint for the WebDriver session; set URBAN_ROUTES_CDP_ENDPOINT '
+                   'or use a grid exposing se:cdp' + ''.join(f'\n  {failure}' for failure in failures))
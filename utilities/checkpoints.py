@@ -0,0 +1,158 @@
+"""
+Checkpoints of browser state along the booking journey.
+
+A checkpoint snapshots the cookies, localStorage, sessionStorage and
+the application URL (with its route/fare query state) after a set of
+journey steps has been completed. Restoring it into a fresh session
+takes one navigation instead of replaying those steps through the UI.
+
+Checkpoints are keyed by the application build (the hashed bundle URLs
+it loads) and by the page-object version (the source of the page and
+scenario modules), so a new app deployment or a page-object change
+never restores state recorded against different code.
+
+Note:
+    Only state the application keeps in cookies, storage or its URL
+    survives a restore. State held purely in memory by the front end is
+    rebuilt from those by the application on load, or not at all. A
+    restore therefore only reports which steps the checkpoint was saved
+    after; Journey counts a step as restored once the page shows it.
+"""
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from urllib.parse import urlsplit
+from pages import scenarios, urban_routes_pages
+
+default_directory = '.urban_routes/checkpoints'
+
+_APP_BUILD = """
+var assets = [];
+document.querySelectorAll('script[src], link[rel="stylesheet"][href]').forEach(function (node) {
+    assets.push(node.src || node.href);
+});
+return assets.sort();
+"""
+
+_SNAPSHOT = """
+function dump(storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) {
+        var key = storage.key(i);
+        items[key] = storage.getItem(key);
+    }
+    return items;
+}
+return {url: location.href, localStorage: dump(localStorage), sessionStorage: dump(sessionStorage)};
+"""
+
+_RESTORE_STORAGE = """
+var snapshot = arguments[0];
+localStorage.clear();
+sessionStorage.clear();
+Object.keys(snapshot.localStorage).forEach(function (key) {
+    localStorage.setItem(key, snapshot.localStorage[key]);
+});
+Object.keys(snapshot.sessionStorage).forEach(function (key) {
+    sessionStorage.setItem(key, snapshot.sessionStorage[key]);
+});
+"""
+
+
+def page_object_version():
+    """Return a hash of the page-object and scenario sources."""
+    digest = hashlib.sha1()
+    for module in (urban_routes_pages, scenarios):
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()[:12]
+
+
+class CheckpointStore:
+    """Saves and restores journey checkpoints on disk."""
+
+    def __init__(self, directory=default_directory):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory the checkpoints are written to
+        """
+        self.directory = Path(directory)
+        self.version = page_object_version()
+        self._builds = {}
+
+    def _build(self, driver):
+        """
+        Return a hash of the application build loaded by the driver.
+
+        Asset URLs are hashed without their scheme and host, so the same build
+        served from another origin, such as a replay server on a new port,
+        keeps its checkpoints.
+        """
+        origin = urlsplit(driver.current_url).netloc
+        if origin not in self._builds:
+            assets = sorted(urlsplit(url)._replace(scheme='', netloc='').geturl()
+                            for url in driver.execute_script(_APP_BUILD))
+            self._builds[origin] = hashlib.sha1(json.dumps(assets).encode()).hexdigest()[:12]
+        return self._builds[origin]
+
+    def _folder(self, driver):
+        """Return the checkpoint folder for the current app build and page-object version."""
+        return self.directory / f'{self._build(driver)}-{self.version}'
+
+    def save(self, driver, completed):
+        """
+        Snapshot the browser state reached after the given journey steps.
+
+        Args:
+            driver: WebDriver instance showing the application
+            completed: Names of the journey steps completed so far
+        """
+        snapshot = driver.execute_script(_SNAPSHOT)
+        snapshot['cookies'] = driver.get_cookies()
+        snapshot['completed'] = list(completed)
+        name = hashlib.sha1('+'.join(sorted(completed)).encode()).hexdigest()[:12]
+        folder = self._folder(driver)
+        folder.mkdir(parents=True, exist_ok=True)
+        folder.joinpath(f'{name}.json').write_text(json.dumps(snapshot, indent=2))
+
+    def best(self, driver, needed):
+        """
+        Return the most advanced checkpoint that only contains needed steps.
+
+        Args:
+            driver: WebDriver instance showing the application
+            needed: Names of the steps the journey has to reach
+
+        Returns:
+            Checkpoint dictionary, or None if there is no usable checkpoint
+        """
+        needed = set(needed)
+        best = None
+        for path in self._folder(driver).glob('*.json'):
+            checkpoint = json.loads(path.read_text())
+            if set(checkpoint['completed']) <= needed and \
+                    (best is None or len(checkpoint['completed']) > len(best['completed'])):
+                best = checkpoint
+        return best
+
+    def restore(self, driver, checkpoint):
+        """
+        Restore a checkpoint into the driver's session.
+
+        Args:
+            driver: WebDriver instance showing the application origin
+            checkpoint: Checkpoint dictionary returned by best()
+
+        Returns:
+            Names of the journey steps completed when the checkpoint was
+            saved, to be confirmed against the page
+        """
+        driver.delete_all_cookies()
+        for cookie in checkpoint['cookies']:
+            driver.add_cookie({key: value for key, value in cookie.items() if key != 'sameSite'
+                               or value in ('Strict', 'Lax', 'None')})
+        driver.execute_script(_RESTORE_STORAGE, checkpoint)
+        driver.get(checkpoint['url'])
+        return list(checkpoint['completed'])
@@ -0,0 +1,115 @@
+"""
+WebDriver command profiler.
+
+Every command a driver sends to chromedriver, CDP commands included,
+is recorded with its latency and payload size and attributed to the
+running test and to the outermost page-object method that issued it.
+Profiling only wraps the drivers it is attached to, so it costs nothing
+when it is not enabled.
+"""
+import json
+import sys
+import threading
+import time
+from pages.urban_routes_pages import UrbanRoutesPage
+
+
+class CommandProfiler:
+    """Collects command statistics per test and page-object method."""
+
+    def __init__(self, page_types=None):
+        """
+        Initialize the profiler.
+
+        Args:
+            page_types: Page object classes whose methods commands are
+                attributed to, defaults to UrbanRoutesPage
+        """
+        self.page_types = tuple(page_types or (UrbanRoutesPage,))
+        self.current_test = None
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def attach(self, driver):
+        """
+        Start profiling the commands of a driver.
+
+        Args:
+            driver: Selenium WebDriver instance
+
+        Returns:
+            The same driver
+        """
+        executor = driver.command_executor
+        if getattr(executor, '_profiled', False):
+            return driver
+        original = executor.execute
+
+        def execute(command, params):
+            start = time.perf_counter()
+            response = original(command, params)
+            self.record(command, params, response, time.perf_counter() - start)
+            return response
+
+        executor.execute = execute
+        executor._profiled = True
+        return driver
+
+    def _page_method(self):
+        """Return the outermost page-object method on the calling stack."""
+        method = None
+        frame = sys._getframe(3)
+        while frame is not None:
+            owner = frame.f_locals.get('self')
+            if isinstance(owner, self.page_types):
+                method = frame.f_code.co_name
+            frame = frame.f_back
+        return method or '<outside page object>'
+
+    def record(self, command, params, response, elapsed):
+        """Add one command to the statistics of the current test and method."""
+        if command == 'executeCdpCommand':
+            command = f"{command}:{params.get('cmd')}"
+        size = len(json.dumps(params, default=str)) + len(json.dumps(response, default=str))
+        key = (self.current_test or '<no test>', self._page_method())
+        with self._lock:
+            entry = self.stats.setdefault(key, {'commands': 0, 'latency': 0.0, 'bytes': 0, 'by_command': {}})
+            entry['commands'] += 1
+            entry['latency'] += elapsed
+            entry['bytes'] += size
+            entry['by_command'][command] = entry['by_command'].get(command, 0) + 1
+
+    def by_method(self):
+        """Return the statistics aggregated over tests, keyed by method name."""
+        methods = {}
+        for (_, method), entry in self.stats.items():
+            total = methods.setdefault(method, {'commands': 0, 'latency': 0.0, 'bytes': 0, 'by_command': {}})
+            total['commands'] += entry['commands']
+            total['latency'] += entry['latency']
+            total['bytes'] += entry['bytes']
+            for command, count in entry['by_command'].items():
+                total['by_command'][command] = total['by_command'].get(command, 0) + count
+        return methods
+
+    def report(self, top=15):
+        """
+        Return the hotspot report, slowest methods first.
+
+        Args:
+            top: Number of methods to list
+
+        Returns:
+            List of report lines
+        """
+        methods = sorted(self.by_method().items(), key=lambda item: -item[1]['latency'])
+        lines = []
+        for method, entry in methods[:top]:
+            commands = ', '.join(f'{name} x{count}' for name, count in
+                                 sorted(entry['by_command'].items(), key=lambda item: -item[1]))
+            lines.append(f"{method}: {entry['commands']} commands, {entry['latency'] * 1000:.0f} ms, "
+                         f"{entry['bytes'] / 1024:.1f} KiB ({commands})")
+        return lines
+
+    def to_json(self):
+        """Return the per-test statistics in a JSON-serializable form."""
+        return [{'test': test, 'method': method, **entry} for (test, method), entry in sorted(self.stats.items())]
@@ -0,0 +1,129 @@
+"""
+Per-step instrumentation of page objects.
+
+Wrapping a page object makes every call of one of its public methods
+a step: its wall time is measured, split into time spent blocked in
+waits and time spent issuing commands, and reported to its listeners.
+A page object and its wait are wrapped only once, however many
+listeners are added, so every step and wait is timed a single time.
+The steps running on the current thread are available through
+running_steps() for tools that attribute lower-level work to them.
+"""
+import functools
+import threading
+import time
+
+_local = threading.local()
+
+
+def _frames():
+    """Return the stack of steps running on the current thread."""
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def running_steps():
+    """Return the names of the steps running on this thread, outermost first."""
+    return [frame['name'] for frame in _frames()]
+
+
+def _timed_wait(wait_method):
+    """Wrap a blocking wait method, e.g. until, so its duration counts as wait time."""
+    @functools.wraps(wait_method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return wait_method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for frame in _frames():
+                frame['wait'] += elapsed
+    return timed
+
+
+def _instrument_wait(wait):
+    """Time a wait object, including the in-page waits of fill, and every wait derived from it, once."""
+    if getattr(wait, '_instrumented', False):
+        return wait
+    wait._instrumented = True
+    wait.until = _timed_wait(wait.until)
+    if getattr(wait, 'fill', None) is not None:
+        wait.fill = _timed_wait(wait.fill)
+    with_timeout = getattr(wait, 'with_timeout', None)
+    if with_timeout is not None:
+        @functools.wraps(with_timeout)
+        def instrumented_with_timeout(timeout):
+            return _instrument_wait(with_timeout(timeout))
+        wait.with_timeout = instrumented_with_timeout
+    return wait
+
+
+def instrument(page, listener):
+    """
+    Report every public method call of a page object as a step.
+
+    Calls made from inside another step are reported too, so nested
+    steps (e.g. set_route calling set_from) are timed inclusively.
+    Instrumenting a page again only adds the listener to the ones its
+    wrapped methods already report to.
+
+    Args:
+        page: Page object instance, its methods are wrapped in place
+        listener: Callable receiving (step_name, total_seconds, wait_seconds)
+
+    Returns:
+        The same page object
+    """
+    listeners = getattr(page, '_step_listeners', None)
+    if listeners is not None:
+        listeners.append(listener)
+        return page
+    listeners = page._step_listeners = [listener]
+    if getattr(page, 'wait', None) is not None:
+        _instrument_wait(page.wait)
+    for name in dir(type(page)):
+        if name.startswith('_'):
+            continue
+        method = getattr(page, name)
+        if not callable(method) or isinstance(method, type):
+            continue
+        def wrapper(*args, _method=method, _name=name, **kwargs):
+            frames = _frames()
+            frame = {'name': _name, 'wait': 0.0}
+            frames.append(frame)
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                frames.pop()
+                for _listener in listeners:
+                    _listener(_name, total, frame['wait'])
+
+        functools.update_wrapper(wrapper, method)
+        setattr(page, name, wrapper)
+    return page
+
+
+class StepTimings:
+    """Listener collecting the total and wait time of every step call."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def __call__(self, step, total, wait):
+        self.samples.setdefault(step, []).append((total, wait))
+
+    def totals(self, step):
+        """Return the wall times recorded for a step."""
+        return [total for total, _ in self.samples.get(step, [])]
+
+    def waits(self, step):
+        """Return the wait times recorded for a step."""
+        return [wait for _, wait in self.samples.get(step, [])]
+
+    def commands(self, step):
+        """Return the non-wait (command) times recorded for a step."""
+        return [total - wait for total, wait in self.samples.get(step, [])]
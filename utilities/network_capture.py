@@ -0,0 +1,290 @@
+import weakref
+from contextlib import contextmanager
+from selenium.common import TimeoutException, WebDriverException
+from utilities.script_timeouts import ensure_script_timeout
+
+# Identifier of the hook's new-document script per driver
+_new_document_scripts = weakref.WeakKeyDictionary()
+
+CAPTURE_HOOK = """
+(function () {
+    if (window.__urbanRoutesCapture) { return; }
+    var store = window.__urbanRoutesCapture = {
+        seq: 0, nextCapture: 1, captures: {}, starts: {}, entries: [], size: 50, listeners: []
+    };
+    function eventsFor(url) {
+        var events = [];
+        Object.keys(store.captures).forEach(function (id) {
+            var capture = store.captures[id];
+            var matches = capture.patterns.length === 0 || capture.patterns.some(function (pattern) {
+                return !!url && url.indexOf(pattern) !== -1;
+            });
+            if (matches) {
+                capture.events.forEach(function (event) {
+                    if (events.indexOf(event) === -1) { events.push(event); }
+                });
+            }
+        });
+        return events;
+    }
+    function record(event, method, url, status, body) {
+        var parsed = body;
+        try { parsed = JSON.parse(body); } catch (e) {}
+        var entry = {requestId: ++store.seq, event: event, method: method, url: url,
+                     status: status, body: body, data: parsed};
+        store.entries.push(entry);
+        if (store.entries.length > store.size) { store.entries.splice(0, store.entries.length - store.size); }
+        store.listeners = store.listeners.filter(function (listener) { return !listener(entry); });
+    }
+    var originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function (input, init) {
+            var url = typeof input === 'string' ? input : (input && input.url) || String(input);
+            var method = (init && init.method) || (input && input.method) || 'GET';
+            var events = eventsFor(url);
+            if (events.length === 0) { return originalFetch.apply(this, arguments); }
+            if (events.indexOf('request') !== -1) { record('request', method, url, null, null); }
+            return originalFetch.apply(this, arguments).then(function (response) {
+                if (events.indexOf('response') !== -1) {
+                    response.clone().text().then(function (body) {
+                        record('response', method, response.url || url, response.status, body);
+                    });
+                }
+                return response;
+            });
+        };
+    }
+    var originalOpen = XMLHttpRequest.prototype.open;
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__captureMethod = method;
+        this.__captureUrl = String(url);
+        return originalOpen.apply(this, arguments);
+    };
+    XMLHttpRequest.prototype.send = function () {
+        var xhr = this, events = eventsFor(xhr.__captureUrl);
+        if (events.indexOf('request') !== -1) {
+            record('request', xhr.__captureMethod, xhr.__captureUrl, null, null);
+        }
+        if (events.indexOf('response') !== -1) {
+            xhr.addEventListener('load', function () {
+                record('response', xhr.__captureMethod, xhr.responseURL || xhr.__captureUrl,
+                       xhr.status, xhr.responseText);
+            });
+        }
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+START_CAPTURE = CAPTURE_HOOK + """
+var store = window.__urbanRoutesCapture;
+var id = store.nextCapture++;
+store.captures[id] = {patterns: arguments[0], events: arguments[1]};
+// Kept after the capture stops, waits only accept events recorded after the start
+store.starts[id] = store.seq;
+store.size = arguments[2];
+return id;
+"""
+
+STOP_CAPTURE = """
+var store = window.__urbanRoutesCapture;
+if (store) { delete store.captures[arguments[0]]; }
+"""
+
+WAIT_FOR_RESPONSE = """
+var pattern = arguments[0], after = arguments[1], captureId = arguments[2], timeout = arguments[3];
+var done = arguments[arguments.length - 1];
+var store = window.__urbanRoutesCapture;
+if (!store) { return done(null); }
+// Without a capture id, the most recently started capture is meant
+var start = store.starts[captureId != null ? captureId : store.nextCapture - 1];
+after = Math.max(after, start || 0);
+function accepts(entry) {
+    return entry.event === 'response' && entry.requestId > after && entry.url.indexOf(pattern) !== -1;
+}
+var latest = null;
+store.entries.forEach(function (entry) {
+    if (accepts(entry) && (!latest || entry.requestId > latest.requestId)) { latest = entry; }
+});
+if (latest) { return done(latest); }
+var timer = null;
+function listener(entry) {
+    if (!accepts(entry)) { return false; }
+    clearTimeout(timer);
+    done(entry);
+    return true;
+}
+store.listeners.push(listener);
+timer = setTimeout(function () {
+    store.listeners = store.listeners.filter(function (other) { return other !== listener; });
+    done(null);
+}, timeout);
+"""
+
+READ_ENTRIES = """
+var store = window.__urbanRoutesCapture;
+return store ? store.entries : [];
+"""
+
+CLEAR_ENTRIES = """
+var store = window.__urbanRoutesCapture;
+if (store) { store.entries = []; }
+"""
+
+
+class NetworkCapture:
+    """
+    Scoped, bounded capture of network events inside the application page.
+
+    A small hook is injected into the page that wraps ``fetch`` and
+    ``XMLHttpRequest``. Nothing is recorded until a capture is started
+    with :meth:`capture`, and then only the requested event types for
+    URLs matching the requested patterns. Recorded events go into a
+    fixed-size ring buffer in the page, so memory stays flat on long
+    journeys and reading them back costs only the relevant events.
+    Waiting for a response is a single asynchronous script call that
+    returns as soon as the response event fires.
+    """
+
+    def __init__(self, driver, timeout=10, buffer_size=50):
+        """
+        Initialize the capture for a WebDriver instance.
+
+        Args:
+            driver: Selenium WebDriver instance
+            timeout: Default seconds to wait for a response
+            buffer_size: Maximum number of events kept in the page
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.buffer_size = buffer_size
+        self._capture_id = None
+
+    def install(self):
+        """
+        Install the hook in the current page and in every page loaded later.
+
+        Installing the hook does not start recording anything.
+        """
+        self.driver.execute_script(CAPTURE_HOOK)
+        # Registered once per browser session, page objects are rebuilt on every reset
+        if hasattr(self.driver, 'execute_cdp_cmd') and self.driver not in _new_document_scripts:
+            _new_document_scripts[self.driver] = self.driver.execute_cdp_cmd(
+                'Page.addScriptToEvaluateOnNewDocument', {'source': CAPTURE_HOOK})['identifier']
+
+    def start(self, *patterns, events=('response',)):
+        """
+        Start recording matching network events until stop() is called.
+
+        Use this instead of capture() when the response is read in a later
+        call than the one sending the request, e.g. a request the page
+        only sends after a debounce or promise chain.
+
+        Args:
+            *patterns: Substrings matched against request URLs, all URLs
+                are recorded if none is given
+            events: Event types to record, 'request' and/or 'response'
+
+        Returns:
+            Identifier of the capture, to pass to stop()
+        """
+        self._capture_id = self.driver.execute_script(START_CAPTURE, list(patterns), list(events), self.buffer_size)
+        return self._capture_id
+
+    def stop(self, capture_id):
+        """Stop a capture started with start(); events already recorded are kept."""
+        self.driver.execute_script(STOP_CAPTURE, capture_id)
+
+    @contextmanager
+    def capture(self, *patterns, events=('response',)):
+        """
+        Record matching network events while the context is active.
+
+        Whether a request is recorded is decided when it starts, so the
+        response of a request sent inside the context is still recorded
+        when it lands after the context has exited.
+
+        Args:
+            *patterns: Substrings matched against request URLs, all URLs
+                are recorded if none is given
+            events: Event types to record, 'request' and/or 'response'
+
+        Yields:
+            This NetworkCapture instance
+        """
+        capture_id = self.start(*patterns, events=events)
+        try:
+            yield self
+        finally:
+            self.stop(capture_id)
+
+    def events(self, pattern=None, event=None):
+        """
+        Return the recorded events still in the ring buffer.
+
+        Args:
+            pattern: Optional substring to filter event URLs
+            event: Optional event type to filter, 'request' or 'response'
+
+        Returns:
+            List of dictionaries with requestId, event, method, url, status,
+            body and data keys, oldest first
+        """
+        return [entry for entry in self.driver.execute_script(READ_ENTRIES) or []
+                if (pattern is None or pattern in entry['url'])
+                and (event is None or entry['event'] == event)]
+
+    def responses(self, pattern=None):
+        """
+        Return the recorded responses indexed by request id.
+
+        Args:
+            pattern: Optional substring to filter response URLs
+
+        Returns:
+            Dictionary mapping request id to the parsed response body
+        """
+        return {entry['requestId']: entry['data'] for entry in self.events(pattern, 'response')}
+
+    def clear(self):
+        """Drop every recorded event."""
+        self.driver.execute_script(CLEAR_ENTRIES)
+
+    def wait_for_response(self, pattern, after=0, timeout=None, capture_id=None):
+        """
+        Block until a response matching the pattern has been recorded.
+
+        Only responses recorded after the capture was started count, so
+        a response of an earlier attempt on the same page is never
+        returned. If matching responses already exist, the newest one is
+        returned immediately; otherwise the call returns the moment the
+        next one lands. On timeout the listener is removed from the page.
+
+        Args:
+            pattern: Substring matched against the response URL
+            after: Only accept responses with a request id above this value
+            timeout: Seconds to wait, defaults to the capture timeout
+            capture_id: Capture the response belongs to, defaults to the
+                last one started by this instance, or else in the page
+
+        Returns:
+            Dictionary with requestId, event, method, url, status, body
+            and data keys
+
+        Raises:
+            TimeoutException: If no matching response arrives in time
+        """
+        timeout = timeout or self.timeout
+        # The script gives up on its own first, so the page listener is removed
+        ensure_script_timeout(self.driver, timeout + 5)
+        try:
+            entry = self.driver.execute_async_script(WAIT_FOR_RESPONSE, pattern, after,
+                                                     capture_id or self._capture_id, int(timeout * 1000))
+        except TimeoutException:
+            entry = None
+        except WebDriverException as error:
+            raise TimeoutException(f"Network capture failed while waiting for '{pattern}'") from error
+        if not entry:
+            raise TimeoutException(f"No response matching '{pattern}' was captured")
+        return entry
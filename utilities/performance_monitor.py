@@ -0,0 +1,166 @@
+"""
+Front-end performance metrics per page-object step.
+
+PerformanceMonitor is a listener for utilities.instrumentation: after
+every outermost page-object step it collects what the application did
+in the meantime and attaches it to that step:
+
+    long_tasks, long_task_max, long_task_total   longtask entries (ms)
+    layout_shift                                 CLS of shifts without input
+    resources, transfer_kb                       resource timing entries
+    script_duration                              Performance.getMetrics (ms)
+    heap_used_mb                                 JS heap after the step
+    navigation                                   navigation timing, once per page
+
+Each sample is checked against the budgets configured in
+data.performance_budgets, e.g. a long task over 100 ms while opening
+the payment picker is reported as a violation of that step.
+"""
+import threading
+from selenium.common import WebDriverException
+from data import data
+from utilities.instrumentation import running_steps
+
+# Buffers long tasks and layout shifts from page load on; installed lazily,
+# so it is re-installed automatically after every navigation
+_OBSERVE = """
+(function () {
+    if (window.__urbanRoutesPerf) { return; }
+    var perf = window.__urbanRoutesPerf = {longTasks: [], layoutShifts: [], resourceIndex: 0,
+                                           navigationRead: false};
+    function observe(type, handler) {
+        try {
+            new PerformanceObserver(function (list) { list.getEntries().forEach(handler); })
+                .observe({type: type, buffered: true});
+        } catch (error) {
+            // Entry type not supported by this browser
+        }
+    }
+    performance.setResourceTimingBufferSize(1000);
+    observe('longtask', function (entry) { perf.longTasks.push(entry.duration); });
+    observe('layout-shift', function (entry) {
+        if (!entry.hadRecentInput) { perf.layoutShifts.push(entry.value); }
+    });
+})();
+"""
+
+# Observers receive their entries in a later task, so the buffers are
+# drained only after the next frame and the task following it
+_DRAIN = _OBSERVE + """
+var done = arguments[arguments.length - 1];
+function drain() {
+    var perf = window.__urbanRoutesPerf;
+    var resources = performance.getEntriesByType('resource').slice(perf.resourceIndex);
+    perf.resourceIndex += resources.length;
+    var navigation = null;
+    var entry = performance.getEntriesByType('navigation')[0];
+    if (entry && !perf.navigationRead && entry.loadEventEnd > 0) {
+        perf.navigationRead = true;
+        navigation = {ttfb: entry.responseStart, dom_content_loaded: entry.domContentLoadedEventEnd,
+                      load: entry.loadEventEnd, transfer_kb: entry.transferSize / 1024};
+    }
+    done({
+        navigation: navigation,
+        resources: resources.length,
+        transferSize: resources.reduce(function (total, resource) { return total + resource.transferSize; }, 0),
+        longTasks: perf.longTasks.splice(0),
+        layoutShifts: perf.layoutShifts.splice(0)
+    });
+}
+requestAnimationFrame(function () { setTimeout(drain, 0); });
+"""
+
+
+def budgets_for(step, budgets):
+    """Return the budgets of a step, step-specific values overriding the '*' defaults."""
+    return {**budgets.get('*', {}), **budgets.get(step, {})}
+
+
+class PerformanceMonitor:
+    """Instrumentation listener collecting front-end metrics per step and checking budgets."""
+
+    def __init__(self, driver, budgets=None):
+        """
+        Initialize the monitor.
+
+        Args:
+            driver: Chrome WebDriver instance showing the application
+            budgets: Dictionary mapping step name (or '*') to metric limits,
+                defaults to data.performance_budgets
+        """
+        self.driver = driver
+        self.budgets = data.performance_budgets if budgets is None else budgets
+        self.samples = {}
+        self.violations = []
+        self._script_duration = None
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Start buffering page entries and enable the browser's performance metrics."""
+        self.driver.execute_script(_OBSERVE)
+        self.driver.execute_cdp_cmd('Performance.enable', {})
+        self._script_duration = self._metrics().get('ScriptDuration', 0.0)
+        return self
+
+    def _metrics(self):
+        """Return the browser's performance metrics by name."""
+        metrics = self.driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']
+        return {metric['name']: metric['value'] for metric in metrics}
+
+    def collect(self):
+        """
+        Collect the metrics accumulated since the previous collection.
+
+        Returns:
+            Dictionary of metric name to value
+        """
+        entries = self.driver.execute_async_script(_DRAIN)
+        metrics = self._metrics()
+        script_duration = metrics.get('ScriptDuration', 0.0)
+        previous, self._script_duration = self._script_duration or 0.0, script_duration
+        if script_duration < previous:
+            # The counter restarts with every document, count from the navigation
+            previous = 0.0
+        sample = {
+            'long_tasks': len(entries['longTasks']),
+            'long_task_max': max(entries['longTasks'], default=0.0),
+            'long_task_total': sum(entries['longTasks']),
+            'layout_shift': sum(entries['layoutShifts']),
+            'resources': entries['resources'],
+            'transfer_kb': entries['transferSize'] / 1024,
+            'script_duration': (script_duration - previous) * 1000,
+            'heap_used_mb': metrics.get('JSHeapUsedSize', 0.0) / 2 ** 20,
+        }
+        if entries['navigation']:
+            sample['navigation'] = entries['navigation']
+        return sample
+
+    def check(self, step, sample):
+        """
+        Check a step's sample against its budgets.
+
+        Returns:
+            List of human-readable budget violations
+        """
+        return [f'{step}: {metric} {sample.get(metric, 0.0):.2f} > {limit}'
+                for metric, limit in sorted(budgets_for(step, self.budgets).items())
+                if sample.get(metric, 0.0) > limit]
+
+    def __call__(self, step, total, wait):
+        """
+        Attach the metrics collected since the previous step to an outermost step.
+
+        Steps called from inside another step are skipped, their metrics
+        are attached to the step that called them.
+        """
+        if any(name != step for name in running_steps()):
+            return
+        try:
+            sample = self.collect()
+        except WebDriverException:
+            # E.g. the page is navigating, the entries are picked up by the next step
+            return
+        violations = self.check(step, sample)
+        with self._lock:
+            self.samples.setdefault(step, []).append(sample)
+            self.violations.extend(violations)
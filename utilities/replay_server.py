@@ -0,0 +1,205 @@
+"""
+Local record/replay stand-in for the Urban Routes backend.
+
+In record mode a local server forwards every request to the real
+application host and stores the responses (static bundle and api/v1
+calls alike) in an on-disk archive. In replay mode the same server
+answers from the archive only, so the suite runs offline with
+loopback latency and deterministic responses.
+
+    python -m utilities.replay_server --mode record
+"""
+import argparse
+import hashlib
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+from data import data
+
+_SKIPPED_HEADERS = {'connection', 'content-encoding', 'content-length', 'keep-alive',
+                    'transfer-encoding', 'strict-transport-security'}
+
+
+class RequestArchive:
+    """On-disk archive of recorded responses, keyed by request."""
+
+    def __init__(self, directory):
+        """
+        Open an archive directory, loading its index if it exists.
+
+        Args:
+            directory: Directory holding index.json and the body files
+        """
+        self.directory = Path(directory)
+        self.index_path = self.directory / 'index.json'
+        self.index = json.loads(self.index_path.read_text()) if self.index_path.exists() else {}
+        self._served = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method, path, body=b''):
+        """Return the archive key of a request."""
+        key = f'{method} {path}'
+        if body:
+            key += ' ' + hashlib.sha1(body).hexdigest()[:12]
+        return key
+
+    def add(self, key, status, headers, body):
+        """Store one response for the key, keeping earlier ones for the same key."""
+        digest = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self.directory.joinpath('bodies').mkdir(parents=True, exist_ok=True)
+            self.directory.joinpath('bodies', digest).write_bytes(body)
+            self.index.setdefault(key, []).append({'status': status, 'headers': headers, 'body': digest})
+            self.index_path.write_text(json.dumps(self.index, indent=2, sort_keys=True))
+
+    def next(self, key):
+        """
+        Return the next recorded response for the key.
+
+        Responses recorded several times for the same request are replayed
+        in recording order, the last one is repeated once they run out.
+
+        Returns:
+            Tuple of status, headers and body, or None if never recorded
+        """
+        with self._lock:
+            responses = self.index.get(key)
+            if not responses:
+                return None
+            position = self._served.get(key, 0)
+            self._served[key] = position + 1
+            response = responses[min(position, len(responses) - 1)]
+        body = self.directory.joinpath('bodies', response['body']).read_bytes()
+        return response['status'], response['headers'], body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Hands every request to the ReplayServer that owns the HTTP server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        self.server.replay.handle(self)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_HEAD = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """
+    In-process HTTP server that records or replays the application.
+
+    The server listens on the loopback interface. Text responses have the
+    upstream origin rewritten to the local one, so absolute URLs in the
+    bundle keep pointing at the stand-in.
+    """
+
+    def __init__(self, archive, mode='replay', upstream=None, host='127.0.0.1', port=0):
+        """
+        Initialize the server.
+
+        Args:
+            archive: Archive directory
+            mode: 'record' to forward and store, 'replay' to serve the archive
+            upstream: Origin of the real application, defaults to data.backend_url
+            host: Interface to listen on
+            port: Port to listen on, 0 picks a free one
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown backend mode '{mode}', expected 'record' or 'replay'")
+        self.archive = RequestArchive(archive)
+        self.mode = mode
+        self.upstream = (upstream or data.backend_url).rstrip('/')
+        self.misses = []
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.replay = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Origin of the local stand-in."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for its thread to finish."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def handle(self, request):
+        """Answer one request from upstream (record) or from the archive (replay)."""
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        key = RequestArchive.key(request.command, request.path, body)
+        if self.mode == 'record':
+            status, headers, content = self._forward(request, body)
+            self.archive.add(key, status, headers, content)
+        else:
+            recorded = self.archive.next(key)
+            if recorded is None:
+                self.misses.append(key)
+                status, headers, content = 404, {'Content-Type': 'text/plain'}, f'Not recorded: {key}'.encode()
+            else:
+                status, headers, content = recorded
+        self._respond(request, status, headers, content)
+
+    def _forward(self, request, body):
+        """Send the request to the real application and return its response."""
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() not in ('host', 'accept-encoding', 'connection')}
+        forwarded = urllib.request.Request(self.upstream + request.path, data=body or None,
+                                           headers=headers, method=request.command)
+        try:
+            with urllib.request.urlopen(forwarded, timeout=30) as response:
+                return response.status, dict(response.headers.items()), response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, dict(error.headers.items()), error.read()
+
+    def _respond(self, request, status, headers, content):
+        """Write a response, rewriting upstream URLs in text bodies."""
+        content_type = next((value for name, value in headers.items() if name.lower() == 'content-type'), '')
+        if content_type.startswith(('text/', 'application/javascript', 'application/json')):
+            content = content.replace(self.upstream.encode(), self.url.encode())
+            content = content.replace(urlsplit(self.upstream).netloc.encode(), urlsplit(self.url).netloc.encode())
+        request.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in _SKIPPED_HEADERS:
+                request.send_header(name, value)
+        request.send_header('Content-Length', str(len(content)))
+        request.end_headers()
+        if request.command != 'HEAD':
+            request.wfile.write(content)
+
+
+def main(argv=None):
+    """Serve the stand-in until interrupted, e.g. to record a session by hand."""
+    parser = argparse.ArgumentParser(description='Record or replay the Urban Routes backend.')
+    parser.add_argument('--mode', choices=('record', 'replay'), default='replay')
+    parser.add_argument('--archive', default=data.backend_archive)
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+    server = ReplayServer(args.archive, args.mode, port=args.port).start()
+    print(f'{args.mode.capitalize()}ing {data.backend_url} at {server.url}{data.urban_routes_path}')
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,42 @@
-import json
-import time
-from selenium.common import WebDriverException
+from selenium.common import TimeoutException
+from utilities.network_capture import NetworkCapture
 
+phone_code_pattern = 'api/v1/number?number'
 
-def retrieve_phone_code(driver) -> str:
+
+def retrieve_phone_code(driver, capture=None) -> str:
     """
-    Retrieve SMS verification code from browser performance logs.
-    
+    Retrieve SMS verification code from the captured API response.
+
     This function extracts the phone verification code that is sent
-    during the phone number confirmation process. It searches through
-    the browser's performance logs to find the API response containing
-    the code.
-    
+    during the phone number confirmation process. The response of the
+    code request is captured in the page as soon as it lands, so the
+    code is returned with a single body lookup and no polling.
+
     Args:
-        driver: Selenium WebDriver instance with performance logging enabled
-        
+        driver: Selenium WebDriver instance
+        capture: NetworkCapture of the page, a new one attached to the
+            page hook is used if omitted
+
     Returns:
         String containing the SMS verification code
-        
+
     Raises:
-        WebDriverException: If code cannot be retrieved from logs
-        
+        Exception: If code cannot be retrieved from the captured responses
+
     Note:
-        Requires Chrome driver with performance logging capability enabled:
-        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        The code request must be sent while a capture of the phone code
+        pattern is active; UrbanRoutesPage.click_on_next_button starts one
+        and set_sms_code stops it once the code has been read.
     """
 
-    code = None
-    for i in range(10):
-        try:
-            logs = [log["message"] for log in driver.get_log('performance') if log.get("message")
-                    and 'api/v1/number?number' in log.get("message")]
-            for log in reversed(logs):
-                message_data = json.loads(log)["message"]
-                body = driver.execute_cdp_cmd('Network.getResponseBody',
-                                              {'requestId': message_data["params"]["requestId"]})
-                code = ''.join([x for x in body['body'] if x.isdigit()])
-        except WebDriverException:
-            time.sleep(1)
-            continue
-        if not code:
-            raise Exception("No se encontró el código de confirmación del teléfono.\n"
-                            "Utiliza 'retrieve_phone_code' solo después de haber solicitado el código en tu aplicación.")
-        return code
+    capture = capture or NetworkCapture(driver)
+    try:
+        response = capture.wait_for_response(phone_code_pattern)
+    except TimeoutException:
+        response = None
+    code = ''.join([x for x in response['body'] if x.isdigit()]) if response else None
+    if not code:
+        raise Exception("No se encontró el código de confirmación del teléfono.\n"
+                        "Utiliza 'retrieve_phone_code' solo después de haber solicitado el código en tu aplicación.")
+    return code
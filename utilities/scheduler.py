@@ -0,0 +1,194 @@
+"""
+Duration-balanced sharding of the Urban Routes scenarios.
+
+Per-test durations recorded by the suite are used to split the
+collected tests into shards of similar total duration (longest
+processing time first). Running this module launches one pytest
+worker process per shard:
+
+    python -m utilities.scheduler --workers 4 tests/urban_routes_tests.py
+
+The shards are assigned once, by a collection-only pytest run writing
+a shard plan, and every worker runs the tests the plan assigns to it.
+Every worker writes its reports, including the durations it measured,
+to files suffixed with its shard index (e.g. performance-2.json), so
+workers never write the same file. Once all workers have finished, the
+scheduler merges the shard files into the files a single process writes,
+in the state directory named by the plan.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from utilities import test_impact
+
+default_duration = 5.0
+
+# Reports written by every worker, with how the shard files are combined
+_STEP_REPORTS = ('performance.json',)
+_ROW_REPORTS = ('commands.json',)
+
+
+def shard_path(directory, name, shard_index=None):
+    """Return the file a worker writes a report to, suffixed with its shard index when sharded."""
+    path = Path(directory) / name
+    return path if shard_index is None else path.with_name(f'{path.stem}-{shard_index}{path.suffix}')
+
+
+def load_durations(directory):
+    """
+    Load the recorded per-test durations.
+
+    Every worker writes its own durations file, files are merged with
+    the most recently written values taking precedence.
+
+    Args:
+        directory: Directory holding the durations*.json files
+
+    Returns:
+        Dictionary mapping test node id to duration in seconds
+    """
+    durations = {}
+    for path in sorted(Path(directory).glob('durations*.json'), key=os.path.getmtime):
+        try:
+            durations.update(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return durations
+
+
+def save_durations(directory, durations, shard_index=None):
+    """Write the durations measured by one worker process."""
+    path = shard_path(directory, 'durations.json', shard_index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(durations, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def assign_shards(nodeids, durations, count):
+    """
+    Split tests into shards balanced by their recorded durations.
+
+    Tests without a recorded duration are assumed to take the mean of
+    the known durations.
+
+    Args:
+        nodeids: Test node ids to distribute
+        durations: Dictionary mapping node id to duration in seconds
+        count: Number of shards
+
+    Returns:
+        List of node id lists, one per shard
+    """
+    known = [durations[nodeid] for nodeid in nodeids if nodeid in durations]
+    fallback = sum(known) / len(known) if known else default_duration
+    weighted = sorted(nodeids, key=lambda nodeid: (-durations.get(nodeid, fallback), nodeid))
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for nodeid in weighted:
+        index = loads.index(min(loads))
+        shards[index].append(nodeid)
+        loads[index] += durations.get(nodeid, fallback)
+    return shards
+
+
+def save_plan(path, state, shards, reused=()):
+    """
+    Write the shard plan the workers of a scheduled run follow.
+
+    Args:
+        path: Plan file to write
+        state: State directory the workers write their reports to
+        shards: List of node id lists, one per shard
+        reused: Node ids whose cached pass is reused by --changed-since
+    """
+    Path(path).write_text(json.dumps({'state': str(state), 'shards': shards, 'reused': list(reused)}, indent=2))
+
+
+def load_plan(path):
+    """Return the shard plan written by save_plan()."""
+    return json.loads(Path(path).read_text())
+
+
+def _read_shards(directory, name, count):
+    """Read the shard files of a report and delete them, skipping unreadable ones."""
+    parts = []
+    for index in range(count):
+        path = shard_path(directory, name, index)
+        try:
+            parts.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+        path.unlink()
+    return parts
+
+
+def merge_shards(directory, count):
+    """
+    Merge the reports written by the shard workers.
+
+    Per-step performance samples are concatenated per step, per-test
+    command statistics are concatenated, and the measured durations and
+    dependency entries are merged into the stored ones.
+
+    Args:
+        directory: State directory the workers wrote to
+        count: Number of shards
+    """
+    directory = Path(directory)
+    for name in _STEP_REPORTS:
+        parts = _read_shards(directory, name, count)
+        if parts:
+            steps = {}
+            for part in parts:
+                for step, samples in part.items():
+                    steps.setdefault(step, []).extend(samples)
+            (directory / name).write_text(json.dumps(steps, indent=2))
+    for name in _ROW_REPORTS:
+        parts = _read_shards(directory, name, count)
+        if parts:
+            (directory / name).write_text(json.dumps([row for part in parts for row in part], indent=2))
+    measured = {}
+    for part in _read_shards(directory, 'durations.json', count):
+        measured.update(part)
+    if measured:
+        durations = load_durations(directory)
+        durations.update(measured)
+        save_durations(directory, durations)
+    entries = {}
+    for part in _read_shards(directory, test_impact.index_file, count):
+        entries.update(part)
+    if entries:
+        test_impact.save_index(directory, entries)
+
+
+def main(argv=None):
+    """Plan the shards, run one pytest process per shard, merge their reports and combine the exit codes."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: CPU count)')
+    args, pytest_args = parser.parse_known_args(argv)
+    pytest = [sys.executable, '-m', 'pytest', '--shard-count', str(args.workers)]
+    with tempfile.TemporaryDirectory() as directory:
+        plan = os.path.join(directory, 'shards.json')
+        collection = subprocess.run([*pytest, '--shard-plan', plan, '--collect-only', '-q', *pytest_args],
+                                    stdout=subprocess.DEVNULL)
+        if not os.path.exists(plan):
+            return collection.returncode
+        processes = [
+            subprocess.Popen([*pytest, '--shard-plan', plan, '--shard-index', str(index), *pytest_args])
+            for index in range(args.workers)
+        ]
+        codes = [process.wait() for process in processes]
+        merge_shards(load_plan(plan)['state'], args.workers)
+    # Exit code 5 means the shard had no tests assigned to it
+    failures = [code for code in codes if code not in (0, 5)]
+    return failures[0] if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Script timeouts applied to WebDriver sessions.
+
+In-page waits run as asynchronous scripts that finish on their own
+deadline, the WebDriver script timeout only has to outlast it. Setting
+it before every script costs a round trip per wait, so the timeout
+applied to each session is remembered and only raised when a script
+needs more time than any before it.
+"""
+import weakref
+
+# Script timeout last applied per driver, in seconds
+_applied = weakref.WeakKeyDictionary()
+
+
+def ensure_script_timeout(driver, seconds):
+    """
+    Make sure asynchronous scripts of a session may run for at least the given time.
+
+    Args:
+        driver: WebDriver instance
+        seconds: Time the next script may need
+    """
+    if _applied.get(driver, 0) < seconds:
+        driver.set_script_timeout(seconds)
+        _applied[driver] = seconds
@@ -0,0 +1,165 @@
+"""
+Pool of reusable browser sessions.
+
+Launching Chrome dominates the setup of a test class, so each worker
+process keeps a pool of browsers that are launched and navigated to
+the application up front, handed out to test classes and reset when
+they come back. The pool of the current process is configured with
+configure_pool() and shared through get_pool().
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from data import data
+from utilities.browser_profiles import profiles, record_memory
+
+_CLEAR_STORAGE = "window.localStorage.clear(); window.sessionStorage.clear();"
+
+
+def launch_browser(profile=None):
+    """
+    Launch a Chrome WebDriver with a named browser profile.
+
+    Args:
+        profile: Profile name, defaults to data.browser_profile
+
+    Returns:
+        WebDriver instance
+    """
+    return profiles[profile or data.browser_profile].launch()
+
+
+class SessionPool:
+    """
+    Pool of pre-launched, pre-navigated WebDriver sessions.
+
+    Browsers are launched once per worker process and handed out to
+    test classes. A browser that comes back to the pool is reset by
+    clearing cookies, localStorage and sessionStorage and reloading the
+    application, which is much cheaper than launching a new Chrome.
+    """
+
+    def __init__(self, size=1, url=None, factory=launch_browser):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Number of browsers launched when the pool is warmed up
+            url: Application URL, defaults to data.urban_routes_url
+            factory: Callable returning a new WebDriver instance
+        """
+        self.size = size
+        self.url = url or data.urban_routes_url
+        self.factory = factory
+        self.hits = 0
+        self.misses = 0
+        self.reset_times = []
+        self._idle = []
+        self._dirty = set()
+        self._all = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _launch(self):
+        """Launch a browser and navigate it to the application."""
+        driver = self.factory()
+        driver.get(self.url)
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def start(self):
+        """Launch and navigate all pooled browsers concurrently."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        with ThreadPoolExecutor(max_workers=max(self.size, 1)) as executor:
+            drivers = list(executor.map(lambda _: self._launch(), range(self.size)))
+        with self._lock:
+            self._idle.extend(drivers)
+
+    def checkout(self):
+        """
+        Take a ready browser from the pool.
+
+        Browsers returned by a previous test class are reset before they
+        are handed out. When no browser is idle a new one is launched.
+
+        Returns:
+            WebDriver instance showing a fresh application page
+        """
+        self.start()
+        with self._lock:
+            driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            dirty = driver in self._dirty
+            self._dirty.discard(driver)
+        if driver is None:
+            return self._launch()
+        if dirty:
+            self.reset(driver)
+        return driver
+
+    def checkin(self, driver):
+        """Return a browser to the pool so it can be reused, sampling its memory after the test class."""
+        record_memory(driver)
+        with self._lock:
+            self._dirty.add(driver)
+            self._idle.append(driver)
+
+    def reset(self, driver):
+        """
+        Reset a browser to a fresh application state without relaunching.
+
+        Args:
+            driver: WebDriver instance to reset
+        """
+        start = time.perf_counter()
+        driver.delete_all_cookies()
+        driver.execute_script(_CLEAR_STORAGE)
+        driver.get(self.url)
+        self.reset_times.append(time.perf_counter() - start)
+
+    def stats(self):
+        """Return hit/miss counts and reset-time statistics for the pool."""
+        resets = len(self.reset_times)
+        return {
+            'size': self.size,
+            'browsers': len(self._all),
+            'hits': self.hits,
+            'misses': self.misses,
+            'resets': resets,
+            'reset_time_total': sum(self.reset_times),
+            'reset_time_mean': sum(self.reset_times) / resets if resets else 0.0,
+            'reset_time_max': max(self.reset_times, default=0.0),
+        }
+
+    def close(self):
+        """Quit every browser launched by the pool."""
+        with self._lock:
+            drivers, self._all, self._idle = self._all, [], []
+            self._dirty.clear()
+            self._started = False
+        for driver in drivers:
+            driver.quit()
+
+
+_pool = None
+
+
+def configure_pool(size=1, url=None, factory=launch_browser):
+    """Create the session pool shared by the current worker process."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = SessionPool(size=size, url=url, factory=factory)
+    return _pool
+
+
+def get_pool():
+    """Return the shared session pool, creating a default one if needed."""
+    return _pool if _pool is not None else configure_pool()
@@ -0,0 +1,30 @@
+def percentile(values, fraction):
+    """
+    Return a percentile of the values using linear interpolation.
+
+    Args:
+        values: Iterable of numbers
+        fraction: Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        The interpolated percentile, or 0.0 for no values
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values):
+    """Return count, mean, p50, p95 and max of the values."""
+    values = list(values)
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p95': percentile(values, 0.95),
+        'max': max(values, default=0.0),
+    }
@@ -0,0 +1,153 @@
+"""
+Post-mortem traces of the last page-object steps.
+
+StepTracer is a listener for utilities.instrumentation: after every
+outermost page-object step it takes a cheap snapshot of the page (URL,
+title, DOM and a speed-optimized JPEG screenshot) in one script call and
+one DevTools call. Decoding and compression happen on a background
+thread, so the test thread never waits for them, and only the last K
+encoded steps are kept in memory.
+
+Nothing is written on green runs. When a test fails, flush() waits for
+the pending snapshots, adds one of the failed state and writes the
+steps to a single zip file:
+
+    trace.json                      steps with test, timings, URL and title
+    03-set_route.html.gz            DOM after the step
+    03-set_route.jpg                screenshot after the step
+"""
+import base64
+import gzip
+import json
+import queue
+import re
+import threading
+import time
+import zipfile
+from collections import deque
+from pathlib import Path
+from selenium.common import WebDriverException
+from utilities.instrumentation import running_steps
+
+_SNAPSHOT = """
+return {url: location.href, title: document.title, dom: document.documentElement.outerHTML};
+"""
+
+_SCREENSHOT = {'format': 'jpeg', 'quality': 50, 'optimizeForSpeed': True}
+
+
+def trace_path(directory, nodeid):
+    """Return the trace file of a test, named after its node id."""
+    return Path(directory) / (re.sub(r'[^\w.-]+', '_', nodeid).strip('_') + '.zip')
+
+
+class StepTracer:
+    """Instrumentation listener keeping compressed snapshots of the last steps."""
+
+    def __init__(self, driver, steps=10, screenshots=True):
+        """
+        Initialize the tracer and start its encoding thread.
+
+        Args:
+            driver: Chrome WebDriver instance showing the application
+            steps: Number of most recent steps kept
+            screenshots: Also capture a screenshot after every step
+        """
+        self.driver = driver
+        self.screenshots = screenshots
+        self.current_test = None
+        self.steps = deque(maxlen=steps)
+        self.capture_time = 0.0
+        self.captures = 0
+        self._sequence = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._encode_pending, name='step-trace', daemon=True)
+        self._worker.start()
+
+    def snapshot(self):
+        """Return the raw state of the page, as sent by the browser."""
+        raw = self.driver.execute_script(_SNAPSHOT)
+        if self.screenshots:
+            raw['screenshot'] = self.driver.execute_cdp_cmd('Page.captureScreenshot', _SCREENSHOT)['data']
+        return raw
+
+    def capture(self, step, total=None, wait=None):
+        """
+        Snapshot the page after a step and queue it for encoding.
+
+        Args:
+            step: Name of the step
+            total: Wall time of the step in seconds
+            wait: Time the step spent in waits in seconds
+        """
+        start = time.perf_counter()
+        try:
+            raw = self.snapshot()
+        except WebDriverException as error:
+            # E.g. the page is navigating or the browser is gone
+            raw = {'error': f'{type(error).__name__}: {error}'.splitlines()[0]}
+        self.capture_time += time.perf_counter() - start
+        self.captures += 1
+        self._sequence += 1
+        self._queue.put({'index': self._sequence, 'step': step, 'test': self.current_test, 'time': time.time(),
+                         'total': total, 'wait': wait, 'raw': raw})
+
+    def __call__(self, step, total, wait):
+        """Capture an outermost step; steps called from inside it are covered by its snapshot."""
+        if any(name != step for name in running_steps()):
+            return
+        self.capture(step, total, wait)
+
+    def _encode_pending(self):
+        """Encode queued snapshots until None is queued."""
+        while True:
+            entry = self._queue.get()
+            try:
+                if entry is None:
+                    return
+                raw = entry.pop('raw')
+                entry.update(url=raw.get('url'), title=raw.get('title'), error=raw.get('error'))
+                if raw.get('dom') is not None:
+                    entry['dom'] = gzip.compress(raw['dom'].encode(), compresslevel=6)
+                if raw.get('screenshot') is not None:
+                    entry['screenshot'] = base64.b64decode(raw['screenshot'])
+                self.steps.append(entry)
+            finally:
+                self._queue.task_done()
+
+    def flush(self, path, error=None):
+        """
+        Write the kept steps and the current page state to a trace file.
+
+        Args:
+            path: Zip file to write, its directory is created if missing
+            error: Failure message stored with the trace
+
+        Returns:
+            The path written
+        """
+        self.capture('<failure>')
+        self._queue.join()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        manifest = {'error': error, 'steps': []}
+        with zipfile.ZipFile(path, 'w') as archive:
+            for entry in list(self.steps):
+                step = re.sub(r'[^\w-]+', '', entry['step'])
+                name = f"{entry['index']:02d}-{step}"
+                record = {key: value for key, value in entry.items() if key not in ('dom', 'screenshot')}
+                # DOM and screenshot are compressed already
+                if 'dom' in entry:
+                    record['dom'] = f'{name}.html.gz'
+                    archive.writestr(record['dom'], entry['dom'], zipfile.ZIP_STORED)
+                if 'screenshot' in entry:
+                    record['screenshot'] = f'{name}.jpg'
+                    archive.writestr(record['screenshot'], entry['screenshot'], zipfile.ZIP_STORED)
+                manifest['steps'].append(record)
+            archive.writestr('trace.json', json.dumps(manifest, indent=2), zipfile.ZIP_DEFLATED)
+        return path
+
+    def close(self):
+        """Stop the encoding thread once the queued snapshots are encoded."""
+        self._queue.put(None)
+        self._worker.join()
@@ -0,0 +1,353 @@
+"""
+Change-aware test selection.
+
+While a test runs, DependencyRecorder records every repository function
+it executes (page-object methods, scenario steps, fixtures, helpers) and
+every attribute of the test data module it reads. The symbols are kept
+per test in a dependency index together with the test's outcome.
+
+Other repository files a test opens while it runs, such as the bodies
+of the replay archive, are recorded by path.
+
+Given a git ref, the lines changed since that ref are mapped back to
+symbols: the innermost function, class attribute (e.g. a locator) or
+module-level name around each changed line. A changed attribute also
+affects every function of its file that references it, so a locator
+tweak selects the tests that called a method using the locator. Tests
+that recorded an affected symbol run again, as do tests missing from
+the index or not passing in it; the others reuse their cached pass.
+A changed file no test was seen using, other than documentation, may be
+read outside of any test (e.g. an archive index loaded at startup), so
+it selects every test.
+"""
+import ast
+import fnmatch
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+index_file = 'impact.json'
+
+# Changes to these files affect every test
+always_run = ('requirements.txt', 'pytest.ini', 'pyproject.toml', 'setup.cfg')
+
+# Changes to files matching these patterns affect no test
+ignored = ('*.md', '*.rst', 'docs/*', 'LICENSE*', '.gitignore')
+
+_recorder = None
+_audit_installed = False
+
+
+def _audit(event, args):
+    """Record the repository files opened while a recorder is active, on any thread."""
+    recorder = _recorder
+    if recorder is not None and event == 'open' and isinstance(args[0], (str, os.PathLike)):
+        filename, mode, flags = os.fspath(args[0]), args[1], args[2]
+        # os.open passes flags instead of a mode
+        reading = 'r' in mode if isinstance(mode, str) else not flags & (os.O_WRONLY | os.O_RDWR)
+        path = recorder._relative(filename)
+        if path is not None and reading and not path.endswith(('.py', '.pyc')):
+            recorder.symbols.add(path)
+
+
+class _RecordingModule(type(sys)):
+    """Module type reporting attribute reads to the active recorder."""
+
+    def __getattribute__(self, name):
+        recorder = _recorder
+        if recorder is not None and not name.startswith('__'):
+            recorder.symbols.add(f"{type(sys).__getattribute__(self, '__impact_path__')}::{name}")
+        return super().__getattribute__(name)
+
+
+class DependencyRecorder:
+    """Records the repository symbols used while it is active."""
+
+    def __init__(self, root, modules=()):
+        """
+        Initialize the recorder.
+
+        Args:
+            root: Repository root, only functions defined below it are recorded
+            modules: Modules whose attribute reads are recorded, e.g. data.data
+        """
+        global _audit_installed
+        self.root = str(Path(root).resolve())
+        self.symbols = set()
+        self._paths = {}
+        self._qualnames = {}
+        if not _audit_installed:
+            # Audit hooks cannot be removed, the hook is idle without a recorder
+            sys.addaudithook(_audit)
+            _audit_installed = True
+        for module in modules:
+            module.__impact_path__ = self._relative(module.__file__)
+            module.__class__ = _RecordingModule
+
+    def _relative(self, filename):
+        """Return the repository-relative path of a source file, or None outside the repository."""
+        path = self._paths.get(filename, False)
+        if path is False:
+            absolute = os.path.realpath(filename)
+            inside = (not filename.startswith('<') and absolute.startswith(self.root + os.sep)
+                      and 'site-packages' not in absolute and absolute != os.path.realpath(__file__))
+            path = self._paths[filename] = Path(absolute).relative_to(self.root).as_posix() if inside else None
+        return path
+
+    def _qualname(self, path, code):
+        """Return the qualified name of a code object, derived from the source before Python 3.11."""
+        qualname = getattr(code, 'co_qualname', None)
+        if qualname is not None:
+            return qualname
+        if path not in self._qualnames:
+            try:
+                tree = ast.parse(Path(self.root, path).read_text())
+            except (OSError, SyntaxError):
+                tree = ast.Module(body=[], type_ignores=[])
+            self._qualnames[path] = {start: name for start, _, name, kind in _definitions(tree) if kind == 'function'}
+        return self._qualnames[path].get(code.co_firstlineno, code.co_name)
+
+    def _profile(self, frame, event, arg):
+        if event == 'call':
+            code = frame.f_code
+            path = self._relative(code.co_filename)
+            if path is not None and code.co_name != '<module>':
+                self.symbols.add(f'{path}::{self._qualname(path, code)}')
+
+    def start(self):
+        """Start recording on the current thread."""
+        global _recorder
+        self.symbols = set()
+        _recorder = self
+        threading.setprofile(self._profile)
+        sys.setprofile(self._profile)
+
+    def stop(self):
+        """Stop recording and return the recorded symbols."""
+        global _recorder
+        sys.setprofile(None)
+        threading.setprofile(None)
+        _recorder = None
+        return set(self.symbols)
+
+
+def _shard_index_file(shard_index):
+    """Return the name of the index file a worker writes, suffixed with its shard index when sharded."""
+    stem, suffix = os.path.splitext(index_file)
+    return index_file if shard_index is None else f'{stem}-{shard_index}{suffix}'
+
+
+def load_index(directory):
+    """
+    Return the dependency index, mapping test node id to its symbols and outcome.
+
+    Shard workers write their entries to their own files until the
+    scheduler merges them, files are merged with the most recently
+    written entries taking precedence.
+    """
+    stem, suffix = os.path.splitext(index_file)
+    index = {}
+    paths = [Path(directory) / index_file, *Path(directory).glob(f'{stem}-*{suffix}')]
+    for path in sorted((path for path in paths if path.exists()), key=os.path.getmtime):
+        try:
+            index.update(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return index
+
+
+def save_index(directory, entries, shard_index=None):
+    """
+    Merge the entries of the tests that ran into the stored index.
+
+    Args:
+        directory: State directory holding the index
+        entries: Dictionary mapping node id to its symbols and outcome
+        shard_index: Index of the shard worker, whose entries are kept in
+            its own file so parallel workers never write the same file
+    """
+    directory = Path(directory)
+    path = directory / _shard_index_file(shard_index)
+    try:
+        index = json.loads(path.read_text()) if shard_index is not None else load_index(directory)
+    except (OSError, ValueError):
+        index = {}
+    index.update(entries)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def changed_lines(root, ref):
+    """
+    Return the lines changed in the working tree since a git ref.
+
+    Untracked files that are not ignored count as new, with every line
+    changed.
+
+    Args:
+        root: Repository root
+        ref: Commit, branch or tag to compare against
+
+    Returns:
+        Dictionary mapping repository-relative path to the set of changed
+        line numbers of its current version (empty for deleted files)
+    """
+    diff = subprocess.run(['git', 'diff', '-U0', '--no-color', '--no-ext-diff', ref, '--'],
+                          cwd=root, capture_output=True, text=True, check=True).stdout
+    changes = {}
+    path, deleted = None, False
+    for line in diff.splitlines():
+        if line.startswith('--- '):
+            old_path = line[4:].removeprefix('a/')
+        elif line.startswith('+++ '):
+            deleted = line[4:] == '/dev/null'
+            path = old_path if deleted else line[4:].removeprefix('b/')
+            changes.setdefault(path, set())
+        elif line.startswith('@@') and path is not None and not deleted:
+            added = line.split()[2].lstrip('+')
+            start, _, count = added.partition(',')
+            start, count = int(start), int(count or 1)
+            # A pure deletion is attributed to the line it happened at
+            changes[path].update(range(start, start + count) if count else (max(start, 1),))
+    untracked = subprocess.run(['git', 'ls-files', '--others', '--exclude-standard', '-z'],
+                               cwd=root, capture_output=True, text=True, check=True).stdout
+    for path in filter(None, untracked.split('\0')):
+        try:
+            count = (Path(root) / path).read_bytes().count(b'\n') + 1
+        except OSError:
+            continue
+        changes[path] = set(range(1, count + 1))
+    return changes
+
+
+def _definitions(tree):
+    """Yield (first line, last line, qualname, kind) for every function, class and assigned name of a module."""
+    def visit(nodes, prefix, in_function):
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = 'class' if isinstance(node, ast.ClassDef) else 'function'
+                start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+                yield start, node.end_lineno, prefix + node.name, kind
+                inner = f'{prefix}{node.name}.<locals>.' if kind == 'function' else f'{prefix}{node.name}.'
+                yield from visit(node.body, inner, kind == 'function')
+            elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+                if in_function:
+                    continue
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            yield node.lineno, node.end_lineno, prefix + name.id, 'name'
+            else:
+                # Definitions inside if, try, with, for, while and match blocks
+                for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                    yield from visit(getattr(node, field, ()), prefix, in_function)
+
+    yield from visit(tree.body, '', False)
+
+
+def _references(node):
+    """Return the names and attribute names referenced inside a node."""
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.add(child.attr)
+    return names
+
+
+def changed_symbols(root, changes):
+    """
+    Map changed lines to the symbols they belong to.
+
+    Args:
+        root: Repository root
+        changes: Result of changed_lines()
+
+    Returns:
+        Set of symbols ('path::qualname'); a bare path stands for a change
+        that could not be attributed to a narrower symbol
+    """
+    symbols = set()
+    for path, lines in changes.items():
+        source_path = Path(root) / path
+        if not path.endswith('.py') or not source_path.exists():
+            symbols.add(path)
+            continue
+        try:
+            tree = ast.parse(source_path.read_text())
+        except SyntaxError:
+            symbols.add(path)
+            continue
+        definitions = list(_definitions(tree))
+        changed_names = set()
+        for line in lines:
+            enclosing = [definition for definition in definitions if definition[0] <= line <= definition[1]]
+            if not enclosing:
+                symbols.add(path)
+                continue
+            start, end, qualname, kind = max(enclosing, key=lambda definition: definition[0])
+            symbols.add(f'{path}::{qualname}')
+            if kind == 'class':
+                # E.g. a base class or decorator, every method may behave differently
+                symbols.update(f'{path}::{inner}' for _, _, inner, _ in definitions
+                               if inner.startswith(qualname + '.'))
+            elif kind == 'name':
+                changed_names.add(qualname.rsplit('.', 1)[-1])
+        # Functions of the same file that use a changed attribute or constant are affected too
+        if changed_names:
+            functions = {start: qualname for start, _, qualname, kind in definitions if kind == 'function'}
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and _references(node) & changed_names:
+                    start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+                    if start in functions:
+                        symbols.add(f'{path}::{functions[start]}')
+    return symbols
+
+
+def affected(entry, symbols):
+    """Return True if a test's recorded symbols intersect the changed symbols."""
+    recorded = set(entry.get('symbols', ()))
+    if recorded & symbols:
+        return True
+    files = {symbol.split('::', 1)[0] for symbol in recorded}
+    return any(symbol in files for symbol in symbols if '::' not in symbol)
+
+
+def select(nodeids, index, symbols, prerequisites=None):
+    """
+    Split tests into the ones to run and the ones whose cached pass is reused.
+
+    Args:
+        nodeids: Collected test node ids, in run order
+        index: Dependency index from load_index()
+        symbols: Changed symbols from changed_symbols()
+        prerequisites: Optional mapping of node id to the node ids of the
+            tests performing its prerequisite steps
+
+    Returns:
+        Tuple of (node ids to run, node ids reusing their cached pass)
+    """
+    recorded = {symbol for entry in index.values() for symbol in entry.get('symbols', ())}
+    everything = any(
+        symbol.split('::', 1)[0] in always_run
+        # Hooks and options of a conftest run outside any test, so they cannot be attributed
+        or symbol.split('::', 1)[0].endswith('conftest.py') and symbol not in recorded
+        # Inputs no test was seen reading may be read outside of any test
+        or not symbol.endswith('.py') and '::' not in symbol and symbol not in recorded
+        and not any(fnmatch.fnmatch(symbol, pattern) for pattern in ignored)
+        for symbol in symbols)
+    run = set()
+    for nodeid in nodeids:
+        entry = index.get(nodeid)
+        if everything or entry is None or entry.get('outcome') != 'passed' or affected(entry, symbols):
+            run.add(nodeid)
+    for nodeid in list(run):
+        run.update((prerequisites or {}).get(nodeid, ()))
+    return [nodeid for nodeid in nodeids if nodeid in run], [nodeid for nodeid in nodeids if nodeid not in run]
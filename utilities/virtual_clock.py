@@ -0,0 +1,142 @@
+"""
+Controllable clock for the application page.
+
+A fake-clock shim is injected into the page. It replaces ``Date``,
+``performance.now`` and the timer functions with versions that follow
+a virtual time which runs at real speed by default, but can be moved
+forward on demand. Advancing the clock fires every timer that falls
+due in between, in order, so countdowns such as the car search timer
+reach their end immediately while the application still performs its
+own UI transition.
+"""
+import weakref
+from selenium.common import JavascriptException
+
+# Identifier of the clock's new-document script per driver
+_new_document_scripts = weakref.WeakKeyDictionary()
+
+_CLOCK_SHIM = """
+(function () {
+    if (window.__urbanRoutesClock) { return; }
+    var slice = Array.prototype.slice;
+    var realSetTimeout = window.setTimeout.bind(window);
+    var realClearTimeout = window.clearTimeout.bind(window);
+    var RealDate = window.Date, realDateNow = RealDate.now.bind(RealDate);
+    var realPerformanceNow = window.performance.now.bind(window.performance);
+    var clock = {offset: 0, timers: {}, nextId: 1};
+
+    function now() { return realDateNow() + clock.offset; }
+    function schedule(timer) {
+        timer.handle = realSetTimeout(function () { fire(timer); }, Math.max(0, timer.due - now()));
+    }
+    function fire(timer) {
+        if (!clock.timers[timer.id]) { return; }
+        if (timer.interval) {
+            timer.due += timer.interval;
+            schedule(timer);
+        } else {
+            delete clock.timers[timer.id];
+        }
+        timer.callback.apply(window, timer.args);
+    }
+    function add(callback, delay, args, repeat) {
+        if (typeof callback !== 'function') { callback = new Function(String(callback)); }
+        delay = Math.max(0, Number(delay) || 0);
+        var timer = {id: clock.nextId++, callback: callback, args: args, due: now() + delay,
+                     interval: repeat ? Math.max(delay, 1) : 0};
+        clock.timers[timer.id] = timer;
+        schedule(timer);
+        return timer.id;
+    }
+    function remove(id) {
+        var timer = clock.timers[id];
+        if (timer) {
+            realClearTimeout(timer.handle);
+            delete clock.timers[id];
+        }
+    }
+
+    window.setTimeout = function (callback, delay) { return add(callback, delay, slice.call(arguments, 2), false); };
+    window.setInterval = function (callback, delay) { return add(callback, delay, slice.call(arguments, 2), true); };
+    window.clearTimeout = window.clearInterval = remove;
+
+    function FakeDate() {
+        if (!(this instanceof FakeDate)) { return new RealDate(now()).toString(); }
+        if (arguments.length === 0) { return new RealDate(now()); }
+        return new (Function.prototype.bind.apply(RealDate, [null].concat(slice.call(arguments))))();
+    }
+    FakeDate.prototype = RealDate.prototype;
+    FakeDate.now = now;
+    FakeDate.parse = RealDate.parse;
+    FakeDate.UTC = RealDate.UTC;
+    window.Date = FakeDate;
+    window.performance.now = function () { return realPerformanceNow() + clock.offset; };
+
+    clock.advance = function (ms) {
+        var target = now() + ms, fired = 0;
+        while (fired < 100000) {
+            var next = null;
+            Object.keys(clock.timers).forEach(function (id) {
+                var timer = clock.timers[id];
+                if (timer.due <= target && (!next || timer.due < next.due)) { next = timer; }
+            });
+            if (!next) { break; }
+            clock.offset += Math.max(0, next.due - now());
+            realClearTimeout(next.handle);
+            fire(next);
+            fired++;
+        }
+        clock.offset += Math.max(0, target - now());
+        Object.keys(clock.timers).forEach(function (id) {
+            realClearTimeout(clock.timers[id].handle);
+            schedule(clock.timers[id]);
+        });
+        return fired;
+    };
+    window.__urbanRoutesClock = clock;
+})();
+"""
+
+_ADVANCE = """
+var clock = window.__urbanRoutesClock;
+return clock ? clock.advance(arguments[0]) : null;
+"""
+
+
+class VirtualClock:
+    """Fake clock installed in the application page of a WebDriver session."""
+
+    def __init__(self, driver):
+        """Initialize the clock for a WebDriver instance."""
+        self.driver = driver
+
+    def install(self):
+        """
+        Install the clock in the current page and in every page loaded later.
+
+        Timers created by the page before the clock is installed keep
+        running on real time.
+        """
+        self.driver.execute_script(_CLOCK_SHIM)
+        # Registered once per browser session, page objects are rebuilt on every reset
+        if hasattr(self.driver, 'execute_cdp_cmd') and self.driver not in _new_document_scripts:
+            _new_document_scripts[self.driver] = self.driver.execute_cdp_cmd(
+                'Page.addScriptToEvaluateOnNewDocument', {'source': _CLOCK_SHIM})['identifier']
+
+    def advance(self, seconds):
+        """
+        Move the page clock forward, firing every timer that falls due.
+
+        Args:
+            seconds: Amount of virtual time to skip
+
+        Returns:
+            Number of timer callbacks fired
+
+        Raises:
+            JavascriptException: If the clock is not installed in the page
+        """
+        fired = self.driver.execute_script(_ADVANCE, int(seconds * 1000))
+        if fired is None:
+            raise JavascriptException('The virtual clock is not installed in the current page')
+        return fired
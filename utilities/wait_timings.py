@@ -0,0 +1,136 @@
+"""
+History-learned wait timeouts per locator.
+
+Every wait that blocks in the page records how long its condition took
+to hold, keyed by condition and locator, in a SQLite file shared by all
+worker processes. Later waits on the same locator get a deadline of the
+observed percentile times a safety factor plus a fixed margin, bounded
+by a floor and by the static timeout of the wait as a cap. Locators with
+too few samples keep the static timeout.
+
+A wait missing its learned deadline gets one more deadline as long
+before it fails, and the time it waited is recorded either way, so a
+slower case than any seen before widens the later deadlines instead of
+failing every time. Real failures still surface after twice the learned
+deadline instead of the full static timeout.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from utilities.stats import percentile
+
+default_path = '.urban_routes/timings.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS waits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS waits_key ON waits (key, id);
+"""
+
+# Keeps the most recent samples of every key
+_PRUNE = """
+DELETE FROM waits WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY key ORDER BY id DESC) AS age FROM waits
+    ) WHERE age > ?
+)
+"""
+
+
+def wait_key(locator, state):
+    """Return the timing key of a wait for a condition state on a locator."""
+    return f'{state}:{locator[0]}={locator[1]}'
+
+
+class TimingStore:
+    """SQLite store of observed wait durations that derives per-locator timeouts."""
+
+    def __init__(self, path=default_path, scope='', fraction=0.95, factor=1.5, margin=0.5, floor=1.0,
+                 min_samples=5, history=50):
+        """
+        Open the store and load the recorded samples.
+
+        Args:
+            path: SQLite file, created if missing
+            scope: Keeps samples of runs that are not comparable apart,
+                e.g. runs with and without virtual time
+            fraction: Percentile of the observed durations, e.g. 0.95
+            factor: Multiplier applied to the percentile
+            margin: Seconds added after the multiplier
+            floor: Shortest timeout ever derived
+            min_samples: Samples needed before a timeout is derived
+            history: Samples kept per key
+        """
+        self.path = Path(path)
+        self.scope = scope
+        self.fraction = fraction
+        self.factor = factor
+        self.margin = margin
+        self.floor = floor
+        self.min_samples = min_samples
+        self.history = history
+        self._pending = []
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+            rows = connection.execute('SELECT key, seconds FROM waits WHERE key LIKE ? ORDER BY id',
+                                      (f'{scope}|%',)).fetchall()
+        self.samples = {}
+        for key, seconds in rows:
+            self.samples.setdefault(key.split('|', 1)[1], []).append(seconds)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def timeout(self, key, cap):
+        """
+        Return the deadline for a wait.
+
+        Args:
+            key: Timing key from wait_key()
+            cap: Static timeout of the wait
+
+        Returns:
+            Learned timeout in seconds, never above cap
+        """
+        with self._lock:
+            samples = self.samples.get(key, [])[-self.history:]
+        if len(samples) < self.min_samples:
+            return cap
+        learned = percentile(samples, self.fraction) * self.factor + self.margin
+        return min(cap, max(self.floor, learned))
+
+    def record(self, key, seconds):
+        """Record how long a wait took for its condition to hold, or waited without it holding."""
+        with self._lock:
+            self.samples.setdefault(key, []).append(seconds)
+            self._pending.append((f'{self.scope}|{key}', seconds, time.time()))
+
+    def flush(self):
+        """Write the samples recorded since the last flush and prune old ones."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with self._connect() as connection:
+            connection.executemany('INSERT INTO waits (key, seconds, recorded) VALUES (?, ?, ?)', pending)
+            connection.execute(_PRUNE, (self.history,))
+
+    def learned(self):
+        """Return the uncapped timeout derived for every key with enough samples."""
+        return {key: self.timeout(key, float('inf')) for key in sorted(self.samples)
+                if len(self.samples[key]) >= self.min_samples}